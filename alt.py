@@ -0,0 +1,338 @@
+#-----------------------------------------------------------------------------
+# Landmarks for A*, Landmarks and Triangle inequality (ALT) search -----------
+#-----------------------------------------------------------------------------
+
+import random
+from array import array
+
+import instrument
+from queues import queue_factory
+from snapshot import vertex_ids, save_arrays, load_arrays
+
+#Bumped whenever the layout written by Landmarks.save changes. Versions 1
+#and 2 were pickles and are no longer read
+FORMAT_VERSION = 3
+MAGIC = b'RMAPLMRK'
+
+#Distance stored for vertices a landmark cannot reach
+UNREACHED = -1
+
+
+class Landmarks:
+
+    """Landmark distance tables over a RouteMap
+
+       For a handful of landmark vertices the cost to every vertex is
+       stored. By the triangle inequality, d(L, t) - d(L, v) is then a
+       lower bound on the cost from v to t for every landmark L, which
+       guides a bidirectional A* search far better than straight-line
+       distance when roads wind and speeds vary. On a directed map the cost
+       from every vertex to each landmark is stored too, giving the bound
+       d(v, L) - d(t, L). On an undirected map the two are the same.
+
+       Attributes:
+       self._labels : vertex elements, indexed by internal id
+       self._ids : dict from Vertex to internal id
+       self._landmarks : internal ids of the landmarks
+       self._table : flat array with the cost from each landmark to vertex
+       i at i*k to i*k+k-1, for k landmarks, or UNREACHED
+       self._table_to : the same for the costs from each vertex to the
+       landmarks, which is self._table itself if the map is undirected
+
+       Methods:
+       select : choose landmarks and compute their distance tables
+       lower_bound : lower bound on the cost between two vertices
+       query : shortest path between two vertices of the RouteMap
+       save, load : write the tables to disk and read them back
+    """
+
+    def __init__(self, routemap):
+        self._routemap = routemap
+        self._labels, self._ids = vertex_ids(routemap)
+        self._landmarks = []
+        self._table = array('q')
+        self._table_to = self._table
+
+    #Preprocessing -----------------------------------------
+
+    def _distances(self, i, routemap=None):
+        #Return the cost from vertex id i to every vertex id, computed with
+        #the RouteMap's own dijkstra, or that of routemap if given
+        routemap = routemap or self._routemap
+        vertex = routemap.get_vertex_by_label(self._labels[i])
+        closed = routemap.dijkstra(vertex)
+        row = array('q', [UNREACHED]) * len(self._labels)
+        for v, (cost, _) in closed.items():
+            row[self._ids[v]] = cost
+        return row
+
+    def select(self, count, strategy='farthest', seed=None):
+        """Chooses count landmarks and computes their distance tables.
+        'farthest' repeatedly picks the vertex furthest from the landmarks
+        so far. 'avoid' grows a shortest path tree from a random vertex and
+        picks a leaf of the subtree where the current bounds are weakest,
+        which tends to cover the map more evenly"""
+        if strategy not in ('farthest', 'avoid'):
+            raise ValueError('Unknown landmark strategy: %s' % strategy)
+        n = len(self._labels)
+        rand = random.Random(seed)
+        rows = []
+        self._landmarks = []
+        count = min(count, n)
+        while len(self._landmarks) < count:
+            if strategy == 'farthest':
+                landmark = self._farthest(rows, rand)
+            else:
+                landmark = self._avoid(rows, rand)
+            if landmark is None:
+                break
+            self._landmarks.append(landmark)
+            rows.append(self._distances(landmark))
+        self._table = self._interleave(rows, n)
+        if self._routemap.is_directed():
+            reverse = self._routemap.reverse()
+            self._table_to = self._interleave([self._distances(i, reverse) for i in self._landmarks], n)
+        else:
+            self._table_to = self._table
+
+    def _interleave(self, rows, n):
+        #Interleave the rows so one vertex's distances are side by side
+        k = len(rows)
+        table = array('q', [UNREACHED]) * (n * k)
+        for j in range(k):
+            table[j::k] = rows[j]
+        return table
+
+    def _farthest(self, rows, rand):
+        #Return the vertex whose nearest landmark is furthest away. With no
+        #landmarks yet, use the vertex furthest from a random start
+        if not rows:
+            start = rand.randrange(len(self._labels))
+            rows = [self._distances(start)]
+        best = None
+        best_cost = -1
+        for i in range(len(self._labels)):
+            if i in self._landmarks:
+                continue
+            nearest = min(row[i] for row in rows)
+            if nearest > best_cost:
+                best, best_cost = i, nearest
+        return best
+
+    def _avoid(self, rows, rand):
+        #Goldberg and Werneck's avoid heuristic
+        candidates = [i for i in range(len(self._labels)) if i not in self._landmarks]
+        if not candidates:
+            return None
+        root = rand.choice(candidates)
+        vertex = self._routemap.get_vertex_by_label
+        closed = self._routemap.dijkstra(vertex(self._labels[root]))
+        children = dict()
+        order = []
+        for v, (_, pred) in closed.items():
+            order.append(v)
+            children.setdefault(v, [])
+            if pred is not None:
+                children.setdefault(pred, []).append(v)
+        #Weight each vertex by how much the current bound from the root
+        #falls short, and total the weights of each subtree. closed lists
+        #vertices in settle order, so children come after their parents
+        size = dict()
+        landmarks = set(self._landmarks)
+        for v in reversed(order):
+            i = self._ids[v]
+            if i in landmarks or any(size[c] is None for c in children[v]):
+                #Subtrees already holding a landmark are skipped
+                size[v] = None
+            else:
+                gap = closed[v][0] - self._bound(rows, root, i)
+                size[v] = gap + sum(size[c] for c in children[v])
+        #Walk down from the root towards the heaviest subtree
+        v = vertex(self._labels[root])
+        while True:
+            options = [c for c in children[v] if size[c] is not None]
+            if not options:
+                break
+            v = max(options, key=lambda c: size[c])
+        if self._ids[v] in landmarks:
+            return None
+        return self._ids[v]
+
+    def _bound(self, rows, i, j):
+        #Lower bound from id i to id j given a list of distance rows
+        best = 0
+        for row in rows:
+            if row[i] >= 0 and row[j] >= 0:
+                best = max(best, abs(row[i] - row[j]))
+        return best
+
+    def num_landmarks(self):
+        return len(self._landmarks)
+
+    def landmarks(self):
+        #Return the landmark vertices
+        vertex = self._routemap.get_vertex_by_label
+        return [vertex(self._labels[i]) for i in self._landmarks]
+
+    #Query -------------------------------------------------
+
+    def lower_bound(self, v, w):
+        #Return a lower bound on the cost of the shortest path from v to w
+        k = len(self._landmarks)
+        a, b = self._ids[v] * k, self._ids[w] * k
+        if self._table_to is self._table:
+            return self._lb(self._table[a:a+k], self._table[b:b+k])
+        return self._lb_directed(self._table[a:a+k], self._table[b:b+k],
+                                 self._table_to[a:a+k], self._table_to[b:b+k])
+
+    def _lb(self, x, y):
+        best = 0
+        for p, q in zip(x, y):
+            if p >= 0 and q >= 0:
+                if p - q > best:
+                    best = p - q
+                elif q - p > best:
+                    best = q - p
+        return best
+
+    def _lb_directed(self, x, y, x_to, y_to):
+        #Bound from the vertex with rows x and x_to to the one with rows y
+        #and y_to, using the costs from and to each landmark
+        best = 0
+        for p, q in zip(x, y):
+            if p >= 0 and q >= 0 and q - p > best:
+                best = q - p
+        for p, q in zip(x_to, y_to):
+            if p >= 0 and q >= 0 and p - q > best:
+                best = p - q
+        return best
+
+    def query(self, v, w, stats=None, queue='apq'):
+        """Computes the shortest path from v to w with a bidirectional A*
+        search, using the average of the landmark bounds towards w and from
+        v as the potential of each vertex. Returns the path as a list of
+        (vertex, cost) pairs, or None if w cannot be reached from v. stats
+        is as for RouteMap.dijkstra. Keys are not integers, so queue should
+        be 'apq', 'lazy' or a factory for a queue that accepts any keys"""
+        instrument.begin(stats)
+        if v is w:
+            if stats is not None:
+                stats['settled'] = 0
+                stats['scanned'] = 0
+            instrument.end(stats, 'alt')
+            return [(v, 0)]
+        start = instrument.clock(stats)
+        k = len(self._landmarks)
+        table = self._table
+        table_to = self._table_to
+        directed = table_to is not table
+        ids = self._ids
+        s, t = ids[v] * k, ids[w] * k
+        from_s, to_t = table[s:s+k], table[t:t+k]
+        from_s_to, to_t_to = table_to[s:s+k], table_to[t:t+k]
+        potentials = dict()
+
+        def potential(x):
+            #Forward potential of x: half the bound to w less half the bound
+            #from v. The backward search uses its negation
+            p = potentials.get(x)
+            if p is None:
+                i = ids[x] * k
+                row = table[i:i+k]
+                if directed:
+                    row_to = table_to[i:i+k]
+                    p = (self._lb_directed(row, to_t, row_to, to_t_to)
+                         - self._lb_directed(from_s, row, from_s_to, row_to)) / 2
+                else:
+                    p = (self._lb(row, to_t) - self._lb(from_s, row)) / 2
+                potentials[x] = p
+            return p
+
+        make = instrument.counting(queue_factory(queue, self._routemap.max_weight), stats)
+        opened = (make(), make())
+        locations = (dict(), dict())
+        labels = ({v: (0, None)}, {w: (0, None)})
+        closed = (set(), set())
+        sign = (1, -1)
+        #The backward search follows edges into each vertex
+        adjacency = (self._routemap._vertices, self._routemap._in_vertices)
+        locations[0][v] = opened[0].add(potential(v), v)
+        locations[1][w] = opened[1].add(-potential(w), w)
+        best = None
+        meet = None
+
+        while opened[0]._length > 0 and opened[1]._length > 0:
+            #With these potentials the two keys add up to the length of a
+            #path through the meeting point, so the usual stopping rule holds
+            if best is not None and opened[0].min()._key + opened[1].min()._key >= best:
+                break
+            side = 0 if opened[0].length() <= opened[1].length() else 1
+            other = 1 - side
+            x = opened[side].remove_min()._value
+            locations[side].pop(x)
+            closed[side].add(x)
+            cost = labels[side][x][0]
+            for y, edge in adjacency[side][x].items():
+                if y in closed[side]:
+                    continue
+                newcost = cost + int(edge.element())
+                if y not in locations[side]:
+                    labels[side][y] = (newcost, x)
+                    locations[side][y] = opened[side].add(newcost + sign[side] * potential(y), y)
+                elif newcost < labels[side][y][0]:
+                    labels[side][y] = (newcost, x)
+                    opened[side].update_key(locations[side][y], newcost + sign[side] * potential(y))
+                if y in labels[other]:
+                    total = labels[side][y][0] + labels[other][y][0]
+                    if best is None or total < best:
+                        best = total
+                        meet = y
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            stats['settled'] = len(closed[0]) + len(closed[1])
+            stats['scanned'] = (instrument.scanned(adjacency[0], closed[0])
+                                + instrument.scanned(adjacency[1], closed[1]))
+        instrument.end(stats, 'alt')
+        if best is None:
+            return None
+
+        path = []
+        x = meet
+        while x is not None:
+            path.append((x, labels[0][x][0]))
+            x = labels[0][x][1]
+        path.reverse()
+        x = labels[1][meet][1]
+        while x is not None:
+            path.append((x, best - labels[1][x][0]))
+            x = labels[1][x][1]
+        return path
+
+    #Persistence -------------------------------------------
+
+    def save(self, filename):
+        #Write the landmark tables to filename in the layout of
+        #snapshot.save_arrays. The table towards the landmarks is only
+        #written for a directed map
+        directed = self._table_to is not self._table
+        save_arrays(filename, MAGIC, FORMAT_VERSION,
+                    [self._labels, self._landmarks, self._table,
+                     self._table_to if directed else [], [int(directed)]])
+
+    @classmethod
+    def load(cls, filename, routemap):
+        #Read landmark tables written by save and attach them to routemap,
+        #which must be the map they were computed for
+        _, arrays = load_arrays(filename, MAGIC, (FORMAT_VERSION,), 'landmark table')
+        if len(arrays) != 5:
+            raise ValueError('%s is truncated or corrupt' % filename)
+        labels, ids, table, table_to, directed = arrays
+        if routemap.is_directed() and not directed[0]:
+            raise ValueError('Landmark tables were computed for an undirected map')
+        landmarks = cls.__new__(cls)
+        landmarks._routemap = routemap
+        landmarks._labels, landmarks._ids = vertex_ids(routemap, labels)
+        landmarks._landmarks = list(ids)
+        landmarks._table = table
+        landmarks._table_to = table_to if directed[0] else table
+        return landmarks
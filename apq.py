@@ -6,6 +6,8 @@ class Element:
 
     """A key, value, and index"""
 
+    __slots__ = ('_key', '_value', '_index')
+
     def __init__(self, k, v, i):
         self._key = k
         self._value = v
@@ -31,11 +33,32 @@ class Element:
 
 class APQ:
 
-    """Does what it says on the tin"""
+    """Adaptable priority queue kept as a d-ary min-heap of Elements
+
+       Each Element records its own position in the heap, so its key can be
+       changed or it can be removed without searching for it. A wider heap
+       (arity 4 by default) is shallower, so adds and key decreases, the
+       common operations in Dijkstra's algorithm, touch fewer elements.
+    """
 
-    def __init__(self):
+    def __init__(self, arity=4):
+        if arity < 2:
+            raise ValueError('APQ arity must be at least 2')
         self._body = []
         self._length = 0
+        self._arity = arity
+
+    @classmethod
+    def heapify(cls, pairs, arity=4):
+        #Build an APQ from an iterable of (key, item) pairs in linear time.
+        #Returns the APQ and a list of the new Elements in input order
+        apq = cls(arity)
+        elements = [Element(k, v, i) for i, (k, v) in enumerate(pairs)]
+        apq._body = list(elements)
+        apq._length = len(elements)
+        for i in range((apq._length - 2) // arity, -1, -1):
+            apq._sift_down(i)
+        return apq, elements
 
     def add(self, key, item):
         #Add a new item into APQ with priority key, and return
@@ -43,7 +66,7 @@ class APQ:
         element = Element(key, item, self._length)
         self._body.append(element)
         self._length += 1
-        self._rebalance(element._index)
+        self._sift_up(element._index)
         return element
 
     def min(self):
@@ -51,69 +74,93 @@ class APQ:
 
     def remove_min(self):
         #Remove and return the value with the minimum key
-        element = self._body[0]
+        body = self._body
+        element = body[0]
+        last = body.pop()
         self._length -= 1
         if self._length > 0:
-            last = self._body.pop()
-            self._body[0] = last
-            self._rebalance(0)
-        else:
-            self._body.pop()
+            body[0] = last
+            last._index = 0
+            self._sift_down(0)
         element._index = None
         return element
 
     def is_empty(self):
         #Return True if no items in APQ
-        if self._length == 0:
-            return True
-        else:
-            return False
+        return self._length == 0
 
     def length(self):
         return self._length
 
     def update_key(self, element, newkey):
         #Update the key in element to be newkey, rebalance APQ
+        oldkey = element._key
         element._key = newkey
-        self._rebalance(element._index)
+        if newkey < oldkey:
+            self._sift_up(element._index)
+        else:
+            self._sift_down(element._index)
 
     def get_key(self, element):
         return element._key
 
     def remove(self, element):
-        self._body[element._index] = self._body.pop()
+        #Remove element from the APQ and return it
+        index = element._index
+        last = self._body.pop()
         self._length -= 1
-        self._rebalance(element._index)
+        if last is not element:
+            self._body[index] = last
+            last._index = index
+            if last._key < element._key:
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
         element._index = None
         return element
 
-    def _rebalance(self, index):
-        #Rebalance APQ, checking from index onwards
-        while index < self._length:
-            if index > 0:
-                #If the element's key is less than its parent's key, swap places
-                if self._body[index] < self._body[(index-1)//2]:
-                    self._body[(index-1)//2], self._body[index] = self._body[index], self._body[(index-1)//2]
-                    #Swap the indices of the two elements
-                    self._body[(index-1)//2]._index, self._body[index]._index = self._body[index]._index, self._body[(index-1)//2]._index
-                    index = (index-1)//2
-                    continue
-            #If the element's key is greater than its left child's, swap places    
-            if (2*index)+1 < self._length and self._body[index] > self._body[(2*index)+1]:
-                self._body[index], self._body[2*index+1] = self._body[2*index+1], self._body[index]
-                #Swap the indices
-                self._body[index]._index, self._body[2*index+1]._index = self._body[2*index+1]._index, self._body[index]._index
-                index = (2*index)+1
-                continue
-            #If the element's key is greater than its right child's, swap places
-            elif (2*index)+2 < self._length and self._body[index] > self._body[(2*index)+2]:
-                self._body[index], self._body[2*index+2] = self._body[2*index+2], self._body[index]
-                #Swap the indices
-                self._body[index]._index, self._body[2*index+2]._index = self._body[2*index+2]._index, self._body[index]._index
-                index = (2*index)+2
-                continue
-            else:
+    def _sift_up(self, index):
+        #Move the element at index towards the root until its parent's key
+        #is no larger than its own
+        body = self._body
+        arity = self._arity
+        element = body[index]
+        key = element._key
+        while index > 0:
+            parent = (index - 1) // arity
+            above = body[parent]
+            if not key < above._key:
+                break
+            body[index] = above
+            above._index = index
+            index = parent
+        body[index] = element
+        element._index = index
+
+    def _sift_down(self, index):
+        #Move the element at index towards the leaves, always swapping with
+        #its smallest child, until no child has a smaller key
+        body = self._body
+        arity = self._arity
+        length = self._length
+        element = body[index]
+        key = element._key
+        first = arity * index + 1
+        while first < length:
+            #Find the smallest child with a key below the element's
+            smallest = None
+            smallest_key = key
+            for child in body[first:first + arity]:
+                if child._key < smallest_key:
+                    smallest = child
+                    smallest_key = child._key
+            if smallest is None:
                 break
+            body[index] = smallest
+            index, smallest._index = smallest._index, index
+            first = arity * index + 1
+        body[index] = element
+        element._index = index
 
     def __str__(self):
         return str(self._body)
@@ -0,0 +1,178 @@
+#-----------------------------------------------------------------------------
+# Microbenchmark of the APQ against its previous implementation --------------
+#-----------------------------------------------------------------------------
+
+import random
+import sys
+import time
+
+from apq import APQ
+
+class OldElement:
+
+    """A key, value, and index"""
+
+    def __init__(self, k, v, i):
+        self._key = k
+        self._value = v
+        self._index = i
+
+    def __eq__(self, other):
+        return self._key == other._key
+
+    def __lt__(self, other):
+        return self._key < other._key
+
+    def _wipe(self):
+        self._key = None
+        self._value = None
+        self._index = None
+
+    def __repr__(self):
+        return self.__str__()
+
+    def __str__(self):
+        return str((self._key, self._value))
+
+
+class OldAPQ:
+
+    """The APQ as it was before the d-ary rewrite, kept for comparison.
+       Its single _rebalance can leave the heap out of order, so its
+       timings are only indicative"""
+
+    def __init__(self):
+        self._body = []
+        self._length = 0
+
+    def add(self, key, item):
+        #Add a new item into APQ with priority key, and return
+        #its Element in the APQ
+        element = OldElement(key, item, self._length)
+        self._body.append(element)
+        self._length += 1
+        self._rebalance(element._index)
+        return element
+
+    def min(self):
+        return self._body[0]
+
+    def remove_min(self):
+        #Remove and return the value with the minimum key
+        element = self._body[0]
+        self._length -= 1
+        if self._length > 0:
+            last = self._body.pop()
+            self._body[0] = last
+            self._rebalance(0)
+        else:
+            self._body.pop()
+        element._index = None
+        return element
+
+    def is_empty(self):
+        #Return True if no items in APQ
+        if self._length == 0:
+            return True
+        else:
+            return False
+
+    def length(self):
+        return self._length
+
+    def update_key(self, element, newkey):
+        #Update the key in element to be newkey, rebalance APQ
+        element._key = newkey
+        self._rebalance(element._index)
+
+    def get_key(self, element):
+        return element._key
+
+    def remove(self, element):
+        self._body[element._index] = self._body.pop()
+        self._length -= 1
+        self._rebalance(element._index)
+        element._index = None
+        return element
+
+    def _rebalance(self, index):
+        #Rebalance APQ, checking from index onwards
+        while index < self._length:
+            if index > 0:
+                #If the element's key is less than its parent's key, swap places
+                if self._body[index] < self._body[(index-1)//2]:
+                    self._body[(index-1)//2], self._body[index] = self._body[index], self._body[(index-1)//2]
+                    #Swap the indices of the two elements
+                    self._body[(index-1)//2]._index, self._body[index]._index = self._body[index]._index, self._body[(index-1)//2]._index
+                    index = (index-1)//2
+                    continue
+            #If the element's key is greater than its left child's, swap places    
+            if (2*index)+1 < self._length and self._body[index] > self._body[(2*index)+1]:
+                self._body[index], self._body[2*index+1] = self._body[2*index+1], self._body[index]
+                #Swap the indices
+                self._body[index]._index, self._body[2*index+1]._index = self._body[2*index+1]._index, self._body[index]._index
+                index = (2*index)+1
+                continue
+            #If the element's key is greater than its right child's, swap places
+            elif (2*index)+2 < self._length and self._body[index] > self._body[(2*index)+2]:
+                self._body[index], self._body[2*index+2] = self._body[2*index+2], self._body[index]
+                #Swap the indices
+                self._body[index]._index, self._body[2*index+2]._index = self._body[2*index+2]._index, self._body[index]._index
+                index = (2*index)+2
+                continue
+            else:
+                break
+
+    def __str__(self):
+        return str(self._body)
+
+
+def sort_workload(make, n, seed=0):
+    #Add n random keys then remove them all
+    rand = random.Random(seed)
+    keys = [rand.random() for _ in range(n)]
+    start = time.perf_counter()
+    q = make()
+    for k in keys:
+        q.add(k, k)
+    while q.length() > 0:
+        q.remove_min()
+    return time.perf_counter() - start
+
+
+def dijkstra_workload(make, n, seed=0):
+    #Mix of adds, key decreases and remove_mins in the proportions a
+    #Dijkstra search over a road map produces
+    rand = random.Random(seed)
+    start = time.perf_counter()
+    q = make()
+    elements = []
+    base = 0.0
+    for _ in range(n):
+        for _ in range(2):
+            elements.append(q.add(base + rand.random(), None))
+        if elements and rand.random() < 0.3:
+            e = elements[rand.randrange(len(elements))]
+            if e._index is not None:
+                q.update_key(e, base + rand.random() * 0.1)
+        base = q.remove_min()._key
+    return time.perf_counter() - start
+
+
+def run(n):
+    #Return timings in seconds for each queue and workload
+    makers = [('old binary', OldAPQ),
+              ('APQ arity 2', lambda: APQ(2)),
+              ('APQ arity 4', lambda: APQ(4)),
+              ('APQ arity 8', lambda: APQ(8))]
+    results = []
+    for name, make in makers:
+        results.append((name, sort_workload(make, n), dijkstra_workload(make, n)))
+    return results
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    print('queue            sort (s)   dijkstra mix (s)')
+    for name, sort_time, mix_time in run(n):
+        print('%-14s %10.3f %18.3f' % (name, sort_time, mix_time))
@@ -0,0 +1,57 @@
+#-----------------------------------------------------------------------------
+# Memory and throughput of CSRGraph against RouteMap -------------------------
+#-----------------------------------------------------------------------------
+
+import random
+import sys
+import time
+import tracemalloc
+
+from csr import CSRGraph
+from generators import grid_map
+
+
+def measure(build):
+    #Return the result of build() and the bytes it allocated
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def compare(side, queries=10, seed=0):
+    #Compare a RouteMap grid of side x side junctions with its CSRGraph,
+    #returning bytes used and full Dijkstra searches per second for each
+    routemap, map_bytes = measure(lambda: grid_map(side, side, seed))
+    csr, csr_bytes = measure(lambda: CSRGraph.from_routemap(routemap))
+    rand = random.Random(seed)
+    sources = [rand.choice(routemap.vertices()) for _ in range(queries)]
+
+    start = time.perf_counter()
+    for v in sources:
+        routemap.dijkstra(v)
+    map_rate = queries / (time.perf_counter() - start)
+
+    ids = [csr.index(v.element()) for v in sources]
+    start = time.perf_counter()
+    for i in ids:
+        csr.dijkstra(i)
+    csr_rate = queries / (time.perf_counter() - start)
+
+    return {'vertices': routemap.num_vertices(),
+            'edges': routemap.num_edges(),
+            'routemap_bytes': map_bytes,
+            'csr_bytes': csr_bytes,
+            'routemap_searches_per_s': map_rate,
+            'csr_searches_per_s': csr_rate}
+
+
+if __name__ == '__main__':
+    sides = [int(a) for a in sys.argv[1:]] or [50, 100, 200]
+    print('vertices    edges   routemap MB   csr MB   routemap/s   csr/s')
+    for side in sides:
+        r = compare(side)
+        print('%8i %8i %13.1f %8.1f %12.2f %7.2f' % (
+            r['vertices'], r['edges'], r['routemap_bytes'] / 1e6,
+            r['csr_bytes'] / 1e6, r['routemap_searches_per_s'], r['csr_searches_per_s']))
@@ -0,0 +1,39 @@
+#-----------------------------------------------------------------------------
+# Delta-stepping against Dijkstra, and its scaling with processes ------------
+#-----------------------------------------------------------------------------
+
+import sys
+
+import compat
+from benchmark import timed
+from deltastep import delta_stepping, default_delta
+from generators import grid_map
+
+
+def compare(side, seed=0):
+    #Time one full search on a side x side grid with the CSR dijkstra and
+    #each form of delta-stepping, returning (name, seconds) pairs
+    graph = grid_map(side, side, seed).csr()
+    results = [('csr dijkstra', timed(graph.dijkstra, 0)[0])]
+    delta = default_delta(graph)
+    for factor in (0.25, 1, 4):
+        width = max(1, int(delta * factor))
+        results.append(('python, delta %i' % width,
+                        timed(delta_stepping, graph, 0, width, vectorized=False)[0]))
+    if compat.numpy() is not None:
+        results.append(('numpy, delta %i' % delta,
+                        timed(delta_stepping, graph, 0, vectorized=True)[0]))
+    processes = 2
+    while processes <= compat.cpu_count():
+        results.append(('%i processes' % processes,
+                        timed(delta_stepping, graph, 0, processes=processes, vectorized=False)[0]))
+        processes *= 2
+    return results
+
+
+if __name__ == '__main__':
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    results = compare(side)
+    print('%-22s %9s %9s' % ('search', 'seconds', 'speedup'))
+    for name, seconds in results:
+        print('%-22s %9.3f %9.2f' % (name, seconds, results[0][1] / seconds))
@@ -0,0 +1,62 @@
+#-----------------------------------------------------------------------------
+# Hub label size, build time and query time ----------------------------------
+#-----------------------------------------------------------------------------
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+from benchmark import timed
+from generators import grid_map, geometric_file
+from solution import graphreader2
+
+
+def measure(name, routemap, queries=1000, seed=0):
+    #Contract routemap, label it in contraction order and time distance
+    #queries against CH and bidirectional searches, returning a dict
+    rand = random.Random(seed)
+    vertices = routemap.vertices()
+    pairs = [(rand.choice(vertices), rand.choice(vertices)) for _ in range(queries)]
+    result = {'map': name, 'vertices': routemap.num_vertices()}
+    result['contract'], _ = timed(routemap.contract)
+    result['build'], labels = timed(routemap.label_hubs, 'ch')
+    result['entries'] = labels.num_entries() / routemap.num_vertices()
+    result['megabytes'] = labels.nbytes() / 1e6
+    seconds, _ = timed(lambda: [routemap.distance(v, w) for v, w in pairs])
+    result['hub'] = seconds / queries
+    seconds, _ = timed(lambda: [routemap.sp(v, w, 'ch') for v, w in pairs[:100]])
+    result['ch'] = seconds / 100
+    seconds, _ = timed(lambda: [routemap.sp(v, w, 'bidirectional') for v, w in pairs[:20]])
+    result['bidirectional'] = seconds / 20
+    return result
+
+
+def maps(sides, cork='corkCityData.txt'):
+    #Yield (name, RouteMap) for Cork, if its file is present, and for grids
+    #and geometric graphs of side x side vertices
+    if os.path.exists(cork):
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield 'cork', graphreader2(cork)
+    for side in sides:
+        yield 'grid %i' % side, grid_map(side, side)
+    with tempfile.TemporaryDirectory() as directory:
+        for side in sides:
+            filename = os.path.join(directory, 'geometric.txt')
+            geometric_file(filename, side * side)
+            with contextlib.redirect_stdout(io.StringIO()):
+                routemap = graphreader2(filename)
+            yield 'geometric %i' % (side * side), routemap
+
+
+if __name__ == '__main__':
+    sides = [int(a) for a in sys.argv[1:]] or [30, 60, 100]
+    print('%-16s %8s %9s %9s %9s %9s %10s %10s %10s' % (
+        'map', 'vertices', 'contract', 'build', 'entries', 'MB', 'hub us', 'ch us', 'bidir us'))
+    for name, routemap in maps(sides):
+        r = measure(name, routemap)
+        print('%-16s %8i %9.2f %9.2f %9.1f %9.2f %10.1f %10.1f %10.1f' % (
+            r['map'], r['vertices'], r['contract'], r['build'], r['entries'], r['megabytes'],
+            r['hub'] * 1e6, r['ch'] * 1e6, r['bidirectional'] * 1e6))
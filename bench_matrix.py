@@ -0,0 +1,38 @@
+#-----------------------------------------------------------------------------
+# Distance matrix scaling with the number of processes -----------------------
+#-----------------------------------------------------------------------------
+
+import multiprocessing
+import random
+import sys
+import time
+
+from generators import grid_map
+
+
+def scaling(side, points, seed=0):
+    #Time a points x points matrix on a side x side grid with 1 process up
+    #to one per core, returning (processes, seconds) pairs
+    routemap = grid_map(side, side, seed)
+    rand = random.Random(seed)
+    chosen = rand.sample(routemap.vertices(), points)
+    routemap.csr()
+    results = []
+    processes = 1
+    while True:
+        start = time.perf_counter()
+        routemap.distance_matrix(chosen, chosen, processes)
+        results.append((processes, time.perf_counter() - start))
+        if processes >= multiprocessing.cpu_count():
+            break
+        processes = min(processes * 2, multiprocessing.cpu_count())
+    return results
+
+
+if __name__ == '__main__':
+    side = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    points = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    results = scaling(side, points)
+    print('processes   seconds   speedup')
+    for processes, seconds in results:
+        print('%9i %9.3f %9.2f' % (processes, seconds, results[0][1] / seconds))
@@ -0,0 +1,43 @@
+#-----------------------------------------------------------------------------
+# Dijkstra throughput with each priority queue -------------------------------
+#-----------------------------------------------------------------------------
+
+import os
+import random
+import sys
+import time
+
+from generators import grid_map
+from queues import QUEUES
+from solution import graphreader2
+
+
+def time_queues(routemap, searches=5, seed=0):
+    #Return the average seconds per full dijkstra search for each queue
+    rand = random.Random(seed)
+    sources = [rand.choice(routemap.vertices()) for _ in range(searches)]
+    times = dict()
+    for name in QUEUES:
+        start = time.perf_counter()
+        for v in sources:
+            routemap.dijkstra(v, queue=name)
+        times[name] = (time.perf_counter() - start) / searches
+    return times
+
+
+def report(name, routemap):
+    times = time_queues(routemap)
+    best = min(times, key=times.get)
+    print('%-12s %8i %8i ' % (name, routemap.num_vertices(), routemap.num_edges())
+          + ' '.join('%8.4f' % times[q] for q in QUEUES) + '   ' + best)
+
+
+if __name__ == '__main__':
+    #Optional arguments are grid sides, default 50 100 200. The Cork map is
+    #included when corkCityData.txt is in the working directory
+    sides = [int(a) for a in sys.argv[1:]] or [50, 100, 200]
+    print('map          vertices    edges ' + ' '.join('%8s' % q for q in QUEUES) + '   fastest')
+    if os.path.exists('corkCityData.txt'):
+        report('cork', graphreader2('corkCityData.txt'))
+    for side in sides:
+        report('grid %i' % side, grid_map(side, side))
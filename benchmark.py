@@ -0,0 +1,181 @@
+#-----------------------------------------------------------------------------
+# Benchmark suite ------------------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#Writes synthetic maps of each kind and size as route files, then times
+#loading them with graphreader and graphreader2, full dijkstra searches,
+#sp with each search algorithm and raw APQ operations on them. The Cork map
+#is included when its file is present. Results are printed and written as
+#JSON, and can be compared with the JSON of an earlier run:
+#
+#  python benchmark.py --edges 1000 10000 100000 --output new.json --compare old.json
+#
+#Sizes are counted in edges. A grid of 10^6 edges takes about a minute and
+#1.6 GB of memory, so 10^7 needs a large machine.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import compat
+from apq import APQ
+from generators import grid_file, geometric_file, scale_free_file
+from solution import graphreader, graphreader2
+
+#Functions writing a map of about the given number of edges to a file
+KINDS = {'grid': lambda filename, edges, seed:
+             grid_file(filename, *([max(2, int((edges / 1.8) ** 0.5))] * 2), seed=seed),
+         'geometric': lambda filename, edges, seed:
+             geometric_file(filename, max(2, edges // 3), seed=seed),
+         'scale-free': lambda filename, edges, seed:
+             scale_free_file(filename, max(4, edges // 3), seed=seed)}
+
+#Algorithms timed through RouteMap.sp
+ALGORITHMS = ('dijkstra', 'bidirectional', 'astar')
+
+
+def timed(function, *args, **kwargs):
+    #Return (seconds, result) for one call of function
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _quietly(function, *args):
+    #Call function with its printed output thrown away
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+
+def time_apq(n, seed=0):
+    #Return the mean seconds per add, update_key and remove_min over n
+    #elements with random keys
+    rand = random.Random(seed)
+    keys = [rand.randrange(10 * n) for _ in range(n)]
+    queue = APQ()
+    start = time.perf_counter()
+    elements = [queue.add(key, i) for i, key in enumerate(keys)]
+    add = time.perf_counter() - start
+    start = time.perf_counter()
+    for element in elements[::2]:
+        queue.update_key(element, element._key // 2)
+    update = time.perf_counter() - start
+    start = time.perf_counter()
+    while queue.length() > 0:
+        queue.remove_min()
+    remove = time.perf_counter() - start
+    return {'add': add / n, 'update_key': update / max(1, len(elements[::2])),
+            'remove_min': remove / n}
+
+
+def bench_file(name, filename, searches=5, seed=0):
+    #Time everything on the route file filename and return a dict of
+    #results, with times in seconds
+    rand = random.Random(seed)
+    result = {'map': name, 'bytes': os.path.getsize(filename)}
+    result['load_graph'], graph = timed(_quietly, graphreader, filename)
+    result['load_routemap'], routemap = timed(_quietly, graphreader2, filename)
+    result['vertices'] = routemap.num_vertices()
+    result['edges'] = routemap.num_edges()
+    vertices = routemap.vertices()
+    sources = [rand.choice(vertices) for _ in range(searches)]
+    pairs = [(rand.choice(vertices), rand.choice(vertices)) for _ in range(searches)]
+
+    seconds = 0.0
+    for v in sources:
+        seconds += timed(graph.dijkstra, graph.get_vertex_by_label(v.element()))[0]
+    result['graph_dijkstra'] = seconds / searches
+    seconds = 0.0
+    for v in sources:
+        seconds += timed(routemap.dijkstra, v)[0]
+    result['dijkstra'] = seconds / searches
+    for algorithm in ALGORITHMS:
+        seconds = 0.0
+        settled = 0
+        for v, w in pairs:
+            stats = dict()
+            seconds += timed(routemap.sp, v, w, algorithm, stats=stats)[0]
+            settled += stats['settled']
+        result['sp_' + algorithm] = seconds / searches
+        result['sp_' + algorithm + '_settled'] = settled / searches
+    for operation, seconds in time_apq(routemap.num_vertices(), seed).items():
+        result['apq_' + operation] = seconds
+    return result
+
+
+def _commit():
+    #Return the current git commit, or None outside a git checkout
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(edges, kinds, searches=5, seed=0, cork='corkCityData.txt'):
+    #Run the suite and return the results as a JSON-ready dict
+    results = []
+    if cork and os.path.exists(cork):
+        results.append(bench_file('cork', cork, searches, seed))
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in kinds:
+            for size in edges:
+                filename = os.path.join(directory, '%s-%i.txt' % (kind, size))
+                generate, _ = timed(KINDS[kind], filename, size, seed)
+                result = bench_file('%s %i' % (kind, size), filename, searches, seed)
+                result['generate'] = generate
+                results.append(result)
+                os.remove(filename)
+    return {'commit': _commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': compat.cpu_count(),
+            'results': results}
+
+
+def report(run, previous=None):
+    #Print the results of run, with the ratio to the same measurement in
+    #the previous run where there is one
+    before = dict()
+    if previous is not None:
+        before = dict((r['map'], r) for r in previous['results'])
+    columns = ['load_routemap', 'dijkstra'] + ['sp_' + a for a in ALGORITHMS] + ['apq_remove_min']
+    print('%-18s %9s %9s ' % ('map', 'vertices', 'edges') + ' '.join('%16s' % c for c in columns))
+    for result in run['results']:
+        cells = []
+        for column in columns:
+            cell = '%9.4g' % result[column]
+            old = before.get(result['map'], {}).get(column)
+            cell += ' x%4.2f' % (result[column] / old) if old else ' ' * 6
+            cells.append(cell.rjust(16))
+        print('%-18s %9i %9i ' % (result['map'], result['vertices'], result['edges']) + ' '.join(cells))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time route loading and searches')
+    parser.add_argument('--edges', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='approximate edges in each generated map')
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=list(KINDS))
+    parser.add_argument('--searches', type=int, default=5, help='searches timed per map')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cork', default='corkCityData.txt', help='Cork route file, if present')
+    parser.add_argument('--output', default='benchmark.json', help='JSON file to write')
+    parser.add_argument('--compare', help='JSON file from an earlier run to compare with')
+    args = parser.parse_args()
+    previous = None
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+    results = run(args.edges, args.kinds, args.searches, args.seed, args.cork)
+    with open(args.output, 'w') as file:
+        json.dump(results, file, indent=1)
+    report(results, previous)
@@ -0,0 +1,106 @@
+#-----------------------------------------------------------------------------
+# Shortest path tree cache ---------------------------------------------------
+#-----------------------------------------------------------------------------
+
+from collections import OrderedDict
+from types import MappingProxyType
+
+
+class TreeCache:
+
+    """Least recently used cache of shortest path trees
+
+       Holds the {vertex: (cost, predecessor)} dicts returned by dijkstra,
+       keyed by source vertex. The least recently used tree is evicted once
+       there are more than max_trees trees, or once the trees hold more than
+       max_entries vertices between them if that is given. Trees are handed
+       out as read-only views, since a caller changing one would corrupt
+       every later lookup from the same source.
+
+       Attributes:
+       hits, misses, evictions : lookup and eviction counts
+       invalidations : number of times the whole cache was cleared
+    """
+
+    def __init__(self, max_trees=16, max_entries=None):
+        self._trees = OrderedDict()
+        #Children of each vertex in a tree, built when a tree is first
+        #repaired after an edge weight changes
+        self._children = dict()
+        self._max_trees = max_trees
+        self._max_entries = max_entries
+        self._entries = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, source):
+        #Return a read-only view of the tree for source, or None if it is
+        #not cached
+        tree = self._trees.get(source)
+        if tree is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._trees.move_to_end(source)
+        return MappingProxyType(tree)
+
+    def put(self, source, tree):
+        #Cache the tree for source, evicting old trees to make room
+        if source in self._trees:
+            self._entries -= len(self._trees.pop(source))
+            self._children.pop(source, None)
+        self._trees[source] = tree
+        self._entries += len(tree)
+        while len(self._trees) > 1 and (
+                len(self._trees) > self._max_trees or
+                (self._max_entries is not None and self._entries > self._max_entries)):
+            old_source, old = self._trees.popitem(last=False)
+            self._children.pop(old_source, None)
+            self._entries -= len(old)
+            self.evictions += 1
+
+    def clear(self):
+        #Drop every tree, as when the graph they were computed on changes
+        if self._trees:
+            self._trees.clear()
+            self._children.clear()
+            self._entries = 0
+            self.invalidations += 1
+
+    def items(self):
+        #Return a list of (source, tree) pairs, least recently used first
+        return list(self._trees.items())
+
+    def children(self, source):
+        #Return the {vertex: set of children} index of the tree for source
+        if source not in self._children:
+            children = dict()
+            for v in self._trees[source]:
+                children[v] = set()
+            for v, (_, pred) in self._trees[source].items():
+                if pred is not None:
+                    children[pred].add(v)
+            self._children[source] = children
+        return self._children[source]
+
+    def resized(self, source, before):
+        #Record that the tree for source held before vertices and may now
+        #hold a different number after being repaired in place
+        self._entries += len(self._trees[source]) - before
+
+    def __contains__(self, source):
+        return source in self._trees
+
+    def __len__(self):
+        return len(self._trees)
+
+    def stats(self):
+        #Return the counters and current size as a dict
+        return {'trees': len(self._trees),
+                'entries': self._entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations}
@@ -0,0 +1,309 @@
+#-----------------------------------------------------------------------------
+# Contraction Hierarchies ----------------------------------------------------
+#-----------------------------------------------------------------------------
+
+from array import array
+from heapq import heappush, heappop
+
+import instrument
+from snapshot import vertex_ids, save_arrays, load_arrays
+
+#Bumped whenever the layout written by ContractionHierarchy.save changes.
+#Version 1 files were pickles and are no longer read
+FORMAT_VERSION = 2
+MAGIC = b'RMAPHIER'
+
+
+class ContractionHierarchy:
+
+    """Contraction hierarchy over an undirected RouteMap
+
+       Vertices are contracted one at a time in order of edge difference.
+       Contracting a vertex adds a shortcut between two of its neighbours
+       whenever the only shortest path between them runs through it. Every
+       edge is then stored once, at its lower ranked end, so a query only
+       has to search upwards from both ends.
+
+       Attributes:
+       self._labels : vertex elements, indexed by internal id
+       self._ids : dict from Vertex to internal id
+       self._rank : contraction order of each id
+       self._offsets, self._targets, self._weights, self._middles : the
+       upward edges of each id in compressed sparse row form. A middle of
+       -1 marks an original edge, anything else is the contracted vertex a
+       shortcut skips over
+
+       Methods:
+       preprocess : contract every vertex and build the upward graph
+       query : shortest path between two vertices of the RouteMap
+       save, load : write the hierarchy to disk and read it back
+    """
+
+    def __init__(self, routemap, witness_limit=500):
+        if routemap.is_directed():
+            raise ValueError('Contraction hierarchies need an undirected route map')
+        self._routemap = routemap
+        #Maximum number of vertices a witness search may settle
+        self._witness_limit = witness_limit
+        self._labels, self._ids = vertex_ids(routemap)
+        self._rank = None
+        self._offsets = None
+        self._targets = None
+        self._weights = None
+        self._middles = None
+        self._shortcuts = 0
+
+    #Preprocessing -----------------------------------------
+
+    def _graph(self):
+        #Return the map as a list of {neighbour: (weight, middle)} dicts
+        adj = [dict() for _ in self._labels]
+        for v, i in self._ids.items():
+            for edge in self._routemap.get_edges(v):
+                j = self._ids[edge.opposite(v)]
+                if i == j:
+                    continue
+                weight = int(edge.element())
+                if j not in adj[i] or weight < adj[i][j][0]:
+                    adj[i][j] = (weight, -1)
+        return adj
+
+    def _witness(self, adj, source, skip, limit):
+        #Dijkstra from source in the remaining graph, avoiding skip, which
+        #gives up once costs pass limit or too many vertices are settled.
+        #Returns the distances found
+        dist = {source: 0}
+        heap = [(0, source)]
+        settled = 0
+        while heap:
+            d, x = heappop(heap)
+            if d > dist[x]:
+                continue
+            settled += 1
+            if d > limit or settled > self._witness_limit:
+                break
+            for y, (weight, _) in adj[x].items():
+                if y == skip:
+                    continue
+                nd = d + weight
+                if nd < dist.get(y, nd + 1):
+                    dist[y] = nd
+                    heappush(heap, (nd, y))
+        return dist
+
+    def _shortcuts_for(self, adj, v):
+        #Return the shortcuts (u, x, weight) needed if v were contracted now
+        needed = []
+        nbrs = list(adj[v].items())
+        for k in range(len(nbrs)):
+            u, (wu, _) = nbrs[k]
+            if k + 1 == len(nbrs):
+                break
+            limit = wu + max(wx for _, (wx, _) in nbrs[k+1:])
+            dist = self._witness(adj, u, v, limit)
+            for x, (wx, _) in nbrs[k+1:]:
+                through = wu + wx
+                if dist.get(x, through + 1) > through:
+                    needed.append((u, x, through))
+        return needed
+
+    def _priority(self, adj, v, deleted):
+        #Edge difference of v, plus the number of its neighbours already
+        #contracted so that contraction spreads evenly over the map
+        return len(self._shortcuts_for(adj, v)) - len(adj[v]) + deleted[v]
+
+    def preprocess(self):
+        """Contracts every vertex in order of edge difference and builds the
+        upward graph used by query"""
+        adj = self._graph()
+        n = len(adj)
+        deleted = [0] * n
+        rank = array('l', [0]) * n
+        up = [None] * n
+        heap = [(self._priority(adj, v, deleted), v) for v in range(n)]
+        heap.sort()
+        contracted = [False] * n
+        order = 0
+        while heap:
+            _, v = heappop(heap)
+            if contracted[v]:
+                continue
+            #Lazy update: the priority may be stale, so recompute it and put
+            #v back if it is no longer the smallest
+            priority = self._priority(adj, v, deleted)
+            if heap and priority > heap[0][0]:
+                heappush(heap, (priority, v))
+                continue
+            for u, x, weight in self._shortcuts_for(adj, v):
+                if x not in adj[u] or weight < adj[u][x][0]:
+                    adj[u][x] = (weight, v)
+                    adj[x][u] = (weight, v)
+                    self._shortcuts += 1
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+            up[v] = adj[v]
+            for u in adj[v]:
+                del adj[u][v]
+                deleted[u] += 1
+            adj[v] = dict()
+        self._rank = rank
+        self._freeze(up)
+
+    def _freeze(self, up):
+        #Pack the upward edges into flat arrays
+        self._offsets = array('l', [0])
+        self._targets = array('l')
+        self._weights = array('q')
+        self._middles = array('l')
+        for v in range(len(up)):
+            for x, (weight, middle) in up[v].items():
+                self._targets.append(x)
+                self._weights.append(weight)
+                self._middles.append(middle)
+            self._offsets.append(len(self._targets))
+
+    def num_shortcuts(self):
+        #Return the number of shortcuts added during preprocessing
+        return self._shortcuts
+
+    #Query -------------------------------------------------
+
+    def _upward(self, labels, heap, closed):
+        #Settle the closest open vertex of one side of the query and relax
+        #its upward edges. Returns the vertex settled
+        d, x = heappop(heap)
+        if x in closed or d > labels[x][0]:
+            return None
+        closed.add(x)
+        for k in range(self._offsets[x], self._offsets[x+1]):
+            y = self._targets[k]
+            nd = d + self._weights[k]
+            if y not in labels or nd < labels[y][0]:
+                labels[y] = (nd, x)
+                heappush(heap, (nd, y))
+        return x
+
+    def query(self, v, w, stats=None):
+        """Computes the shortest path from v to w, two vertices of the
+        RouteMap, by searching upwards in the hierarchy from both ends.
+        Returns the path as a list of (vertex, cost) pairs in the same form
+        as RouteMap.bidirectional_dijkstra, or None if w cannot be reached.
+        stats is as for RouteMap.dijkstra. The heaps here are plain heapq
+        lists with stale entries skipped, so they never decrease a key"""
+        if self._offsets is None:
+            raise ValueError('Contraction hierarchy has not been preprocessed')
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        s, t = self._ids[v], self._ids[w]
+        labels = ({s: (0, -1)}, {t: (0, -1)})
+        heaps = ([(0, s)], [(0, t)])
+        closed = (set(), set())
+        best = None
+        meet = None
+        counting = isinstance(stats, instrument.SearchStats)
+        pops = 0
+        while True:
+            #The upward searches do not settle vertices in order of distance
+            #from the source, so each side carries on until its smallest key
+            #reaches the best path found
+            active = [side for side in (0, 1)
+                      if heaps[side] and (best is None or heaps[side][0][0] < best)]
+            if not active:
+                break
+            for side in active:
+                x = self._upward(labels[side], heaps[side], closed[side])
+                if counting:
+                    pops += 1
+                    if len(heaps[side]) > stats.peak_queue:
+                        stats.peak_queue = len(heaps[side])
+                if x is not None and x in labels[1-side]:
+                    total = labels[0][x][0] + labels[1][x][0]
+                    if best is None or total < best:
+                        best = total
+                        meet = x
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            offsets = self._offsets
+            stats['settled'] = len(closed[0]) + len(closed[1])
+            stats['scanned'] = sum(offsets[x+1] - offsets[x] for side in closed for x in side)
+        if counting:
+            #Every entry pushed was either popped or is still on a heap
+            stats.pops += pops
+            stats.pushes += pops + len(heaps[0]) + len(heaps[1])
+        if best is None:
+            instrument.end(stats, 'ch')
+            return None
+
+        #Chain of upward edges from s to the meeting vertex and on to t
+        ids = []
+        x = meet
+        while x != -1:
+            ids.append(x)
+            x = labels[0][x][1]
+        ids.reverse()
+        x = labels[1][meet][1]
+        while x != -1:
+            ids.append(x)
+            x = labels[1][x][1]
+        start = instrument.clock(stats)
+        path = self._unpack(ids)
+        instrument.phase(stats, 'unpack', start)
+        instrument.end(stats, 'ch')
+        return path
+
+    def _edge(self, a, b):
+        #Return (weight, middle) of the edge between a and b, which is stored
+        #at whichever end was contracted first
+        if self._rank[a] > self._rank[b]:
+            a, b = b, a
+        best = None
+        for k in range(self._offsets[a], self._offsets[a+1]):
+            if self._targets[k] == b:
+                if best is None or self._weights[k] < best[0]:
+                    best = (self._weights[k], self._middles[k])
+        return best
+
+    def _unpack(self, ids):
+        #Expand every shortcut in the chain of ids into the original edges it
+        #stands for, returning (vertex, cost) pairs
+        vertex = self._routemap.get_vertex_by_label
+        path = [(vertex(self._labels[ids[0]]), 0)]
+        cost = 0
+        stack = [(ids[k-1], ids[k]) for k in range(len(ids) - 1, 0, -1)]
+        while stack:
+            a, b = stack.pop()
+            weight, middle = self._edge(a, b)
+            if middle == -1:
+                cost += weight
+                path.append((vertex(self._labels[b]), cost))
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return path
+
+    #Persistence -------------------------------------------
+
+    def save(self, filename):
+        #Write the preprocessed hierarchy to filename in the layout of
+        #snapshot.save_arrays
+        save_arrays(filename, MAGIC, FORMAT_VERSION,
+                    [self._labels, self._rank, self._offsets, self._targets,
+                     self._weights, self._middles, [self._shortcuts]])
+
+    @classmethod
+    def load(cls, filename, routemap):
+        #Read a hierarchy written by save and attach it to routemap, which
+        #must be the map it was built from
+        if routemap.is_directed():
+            raise ValueError('Contraction hierarchies need an undirected route map')
+        _, arrays = load_arrays(filename, MAGIC, (FORMAT_VERSION,), 'contraction hierarchy')
+        if len(arrays) != 7:
+            raise ValueError('%s is truncated or corrupt' % filename)
+        ch = cls.__new__(cls)
+        ch._routemap = routemap
+        ch._witness_limit = None
+        ch._labels, ch._ids = vertex_ids(routemap, arrays[0])
+        ch._rank, ch._offsets, ch._targets, ch._weights, ch._middles = arrays[1:6]
+        ch._shortcuts = arrays[6][0]
+        return ch
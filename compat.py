@@ -0,0 +1,38 @@
+#-----------------------------------------------------------------------------
+# Optional and platform dependent modules ------------------------------------
+#-----------------------------------------------------------------------------
+
+#NumPy is optional, and only the array paths use it, so it is imported the
+#first time one of them asks for it rather than whenever solution.py is.
+#multiprocessing is likewise only imported by the parallel paths.
+
+#The numpy module once looked for, None if it is not installed, or False if
+#it has not been looked for yet
+_numpy = False
+
+
+def numpy():
+    #Return the numpy module, or None if NumPy is not installed
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+
+def cpu_count():
+    #Return the number of cores, the default size of worker pools
+    import multiprocessing
+    return multiprocessing.cpu_count()
+
+
+def fork_context():
+    #Return the multiprocessing context worker pools are started from: fork
+    #where the platform has it, so workers inherit the parent's graph
+    #arrays instead of being sent pickled copies, and the default elsewhere
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else None)
@@ -0,0 +1,73 @@
+#-----------------------------------------------------------------------------
+# Connected components -------------------------------------------------------
+#-----------------------------------------------------------------------------
+
+
+class Components:
+
+    """Union-find over the vertices of a map
+
+       Each vertex points towards the root of its component, and roots keep
+       the size of their component. find halves the path it walks, and
+       union hangs the smaller tree under the larger, so both take nearly
+       constant time. Edges can only ever join components, so removing one
+       needs the whole structure to be rebuilt.
+
+       Methods:
+       add : add a vertex in a component of its own
+       union : join the components of two vertices
+       find : the root vertex standing for a vertex's component
+       connected : whether two vertices are in the same component
+       rebuild : recompute the components of a map from scratch
+    """
+
+    def __init__(self):
+        self._parent = dict()
+        self._size = dict()
+        self._count = 0
+
+    def add(self, v):
+        if v not in self._parent:
+            self._parent[v] = v
+            self._size[v] = 1
+            self._count += 1
+
+    def find(self, v):
+        #Return the root of v's component
+        parent = self._parent
+        while parent[v] is not v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    def union(self, a, b):
+        #Join the components of a and b
+        a, b = self.find(a), self.find(b)
+        if a is b:
+            return
+        if self._size[a] < self._size[b]:
+            a, b = b, a
+        self._parent[b] = a
+        self._size[a] += self._size.pop(b)
+        self._count -= 1
+
+    def connected(self, a, b):
+        return self.find(a) is self.find(b)
+
+    def size(self, v):
+        #Return the number of vertices in v's component
+        return self._size[self.find(v)]
+
+    def num_components(self):
+        return self._count
+
+    def rebuild(self, graph):
+        #Recompute the components of graph from its vertices and edges
+        self._parent = dict()
+        self._size = dict()
+        self._count = 0
+        for v in graph.vertices():
+            self.add(v)
+        for v in graph.vertices():
+            for e in graph.get_edges(v):
+                self.union(v, e.opposite(v))
@@ -0,0 +1,182 @@
+#-----------------------------------------------------------------------------
+# Compressed Sparse Row Graph ------------------------------------------------
+#-----------------------------------------------------------------------------
+
+from array import array
+from heapq import heappush, heappop
+
+import compat
+
+#Cost given to vertices that cannot be reached
+INFINITY = 2**62
+
+
+class CSRGraph:
+
+    """Frozen, array-backed copy of a RouteMap
+
+       Vertices are numbered 0 to n-1. The edges leaving vertex i are
+       targets[offsets[i]:offsets[i+1]], with matching costs in weights.
+       Every undirected edge is stored once in each direction. Costs are the
+       same int-truncated weights RouteMap.dijkstra uses.
+
+       Attributes:
+       self._labels : vertex elements, indexed by id
+       self._index : maps vertex element to id, with a get method like a dict
+       self._offsets, self._targets, self._weights : adjacency arrays
+       self._lats, self._longs : coordinates, indexed by id
+
+       Methods:
+       from_routemap : build a CSRGraph from a RouteMap
+       dijkstra : shortest path costs and predecessors from one id
+       to_closed : convert a dijkstra result to RouteMap.dijkstra's form
+    """
+
+    def __init__(self, labels, offsets, targets, weights, lats, longs, index=None):
+        #The arrays may be any sequences of numbers, such as memoryviews of a
+        #snapshot file. If index is not given a dict is built from labels
+        self._labels = labels
+        if index is None:
+            index = dict()
+            for i in range(len(labels)):
+                index[labels[i]] = i
+        self._index = index
+        self._offsets = offsets
+        self._targets = targets
+        self._weights = weights
+        self._lats = lats
+        self._longs = longs
+
+    @classmethod
+    def from_routemap(cls, routemap):
+        #Build a CSRGraph holding the same vertices, edges and coordinates
+        vertices = routemap.vertices()
+        ids = dict()
+        for i in range(len(vertices)):
+            ids[vertices[i]] = i
+        labels = array('q', [v.element() for v in vertices])
+        offsets = array('q', [0])
+        targets = array('l')
+        weights = array('q')
+        lats = array('d')
+        longs = array('d')
+        for v in vertices:
+            for edge in routemap.get_edges(v):
+                targets.append(ids[edge.opposite(v)])
+                weights.append(int(edge.element()))
+            offsets.append(len(targets))
+            lat, long = routemap.get_coords(v)
+            lats.append(lat)
+            longs.append(long)
+        return cls(labels, offsets, targets, weights, lats, longs)
+
+    #Query methods -----------------------------------------
+
+    def num_vertices(self):
+        #Return the number of vertices
+        return len(self._labels)
+
+    def num_edges(self):
+        #Return the number of directed edge entries, two per undirected edge
+        return len(self._targets)
+
+    def index(self, label):
+        #Return the id of the vertex with element label, or None
+        return self._index.get(label)
+
+    def label(self, i):
+        #Return the element of the vertex with id i
+        return self._labels[i]
+
+    def get_coords(self, i):
+        #Return the co-ordinates of the vertex with id i
+        return (self._lats[i], self._longs[i])
+
+    def neighbours(self, i):
+        #Return a list of (id, cost) pairs for the edges leaving i
+        start, end = self._offsets[i], self._offsets[i+1]
+        return list(zip(self._targets[start:end], self._weights[start:end]))
+
+    def nbytes(self):
+        #Return the number of bytes held in the graph's arrays
+        total = 0
+        for a in (self._labels, self._offsets, self._targets, self._weights,
+                  self._lats, self._longs):
+            total += len(a) * a.itemsize
+        return total
+
+    def as_numpy(self):
+        #Return the adjacency arrays as NumPy arrays sharing the same memory
+        numpy = compat.numpy()
+        if numpy is None:
+            raise ImportError('as_numpy requires NumPy')
+        return (numpy.frombuffer(self._offsets, dtype=numpy.int64),
+                numpy.frombuffer(self._targets, dtype='i%d' % self._targets.itemsize),
+                numpy.frombuffer(self._weights, dtype=numpy.int64))
+
+    #Dijkstra's Algorithm ----------------------------------
+
+    def dijkstra(self, source, target=None, targets=None):
+        """Computes the shortest path costs from the vertex with id source
+        to every other vertex. Returns (dist, pred) arrays indexed by id,
+        with INFINITY and -1 for vertices not reached. If target is given
+        the search stops once it is settled, or if targets is a collection
+        of ids once all of them are settled. The entries of vertices further
+        away than that are only upper bounds"""
+        n = len(self._labels)
+        offsets, heads, weights = self._offsets, self._targets, self._weights
+        dist = array('q', [INFINITY]) * n
+        pred = array('l', [-1]) * n
+        done = bytearray(n)
+        dist[source] = 0
+        heap = [(0, source)]
+        if targets is not None:
+            remaining = len(set(targets))
+            wanted = bytearray(n)
+            for t in targets:
+                wanted[t] = 1
+        while heap:
+            d, x = heappop(heap)
+            if done[x]:
+                continue
+            done[x] = 1
+            if x == target:
+                break
+            if targets is not None and wanted[x]:
+                remaining -= 1
+                if remaining == 0:
+                    break
+            for k in range(offsets[x], offsets[x+1]):
+                y = heads[k]
+                nd = d + weights[k]
+                if nd < dist[y]:
+                    dist[y] = nd
+                    pred[y] = x
+                    heappush(heap, (nd, y))
+        return dist, pred
+
+    def sp(self, source, target):
+        #Return the shortest path from the vertex with element source to the
+        #one with element target as a list of (element, leg cost) pairs, in
+        #the form RouteMap.sp uses, or None if target cannot be reached
+        s, t = self.index(source), self.index(target)
+        dist, pred = self.dijkstra(s, t)
+        if dist[t] == INFINITY:
+            return None
+        route = []
+        i = t
+        while i != s:
+            route.append((self._labels[i], dist[i] - dist[pred[i]]))
+            i = pred[i]
+        return route[::-1]
+
+    def to_closed(self, routemap, dist, pred):
+        #Convert the arrays returned by dijkstra into the
+        #{vertex: (cost, predecessor)} dict RouteMap.dijkstra returns
+        vertex = routemap.get_vertex_by_label
+        closed = dict()
+        for i in range(len(dist)):
+            if dist[i] != INFINITY:
+                p = pred[i]
+                closed[vertex(self._labels[i])] = (dist[i], None if p == -1 else vertex(self._labels[p]))
+        return closed
@@ -0,0 +1,215 @@
+#-----------------------------------------------------------------------------
+# Delta-stepping single source shortest paths --------------------------------
+#-----------------------------------------------------------------------------
+
+#Meyer and Sanders' delta-stepping over a CSRGraph. Vertices wait in buckets
+#of width delta by tentative cost. The lowest bucket is emptied by relaxing
+#the light edges (cost at most delta) of all its vertices at once, repeating
+#while relaxations put vertices back into it, then the heavy edges of every
+#vertex it held are relaxed once. Each round relaxes a whole frontier rather
+#than a single vertex, which is what lets the work be spread out:
+#  - with NumPy installed, a frontier's edges are relaxed as array operations
+#  - with processes > 1, the relaxation requests of a frontier are generated
+#    by a pool of worker processes and applied by this one
+#A small delta does little wasted work but many rounds, a large one the
+#reverse; with delta at least the largest edge cost it is Bellman-Ford.
+
+from array import array
+from heapq import heappush, heappop
+
+import compat
+from csr import INFINITY
+
+#Graph and bucket width used by each worker process
+_graph = None
+_delta = None
+
+
+def default_delta(graph):
+    #Return the mean edge cost of graph, rounded up, as the bucket width
+    m = graph.num_edges()
+    if m == 0:
+        return 1
+    return max(1, -(-sum(graph._weights) // m))
+
+
+class _Buckets:
+
+    """Buckets of vertex ids by tentative cost, with the lowest found
+       through a heap of bucket numbers"""
+
+    def __init__(self, delta):
+        self._delta = delta
+        self._buckets = dict()
+        self._heap = []
+
+    def move(self, v, old, new):
+        #Move v from the bucket for cost old, if it was reached, to the
+        #bucket for cost new
+        if old != INFINITY:
+            i = old // self._delta
+            bucket = self._buckets.get(i)
+            if bucket is not None:
+                bucket.discard(v)
+        i = new // self._delta
+        bucket = self._buckets.get(i)
+        if bucket is None:
+            bucket = self._buckets[i] = set()
+            heappush(self._heap, i)
+        bucket.add(v)
+
+    def lowest(self):
+        #Return the number of the lowest non-empty bucket, or None
+        while self._heap:
+            i = self._heap[0]
+            if self._buckets.get(i):
+                return i
+            heappop(self._heap)
+            self._buckets.pop(i, None)
+        return None
+
+    def take(self, i):
+        #Empty bucket i and return what it held
+        bucket = self._buckets[i]
+        self._buckets[i] = set()
+        return bucket
+
+
+def _requests(graph, frontier, delta, light):
+    #Return (v, cost, u) for each light or heavy edge from u to v leaving
+    #the (u, cost of u) pairs in frontier
+    offsets, targets, weights = graph._offsets, graph._targets, graph._weights
+    requests = []
+    for u, du in frontier:
+        for k in range(offsets[u], offsets[u+1]):
+            w = weights[k]
+            if (w <= delta) == light:
+                requests.append((targets[k], du + w, u))
+    return requests
+
+
+def _init(graph, delta):
+    global _graph, _delta
+    _graph = graph
+    _delta = delta
+
+
+def _work(task):
+    #Worker: generate the requests for one slice of a frontier
+    frontier, light = task
+    return _requests(_graph, frontier, _delta, light)
+
+
+def _relax(requests, dist, pred, buckets):
+    for v, cost, u in requests:
+        if cost < dist[v]:
+            buckets.move(v, dist[v], cost)
+            dist[v] = cost
+            pred[v] = u
+
+
+def _sequential(graph, source, delta, pool, processes):
+    #Delta-stepping with requests generated in this process or by pool
+    n = graph.num_vertices()
+    dist = array('q', [INFINITY]) * n
+    pred = array('q', [-1]) * n
+    buckets = _Buckets(delta)
+    buckets.move(source, INFINITY, 0)
+    dist[source] = 0
+
+    def requests(vertices, light):
+        frontier = [(u, dist[u]) for u in vertices]
+        if pool is None or len(frontier) < processes * 64:
+            return _requests(graph, frontier, delta, light)
+        size = -(-len(frontier) // processes)
+        tasks = [(frontier[k:k+size], light) for k in range(0, len(frontier), size)]
+        result = []
+        for part in pool.map(_work, tasks):
+            result.extend(part)
+        return result
+
+    i = buckets.lowest()
+    while i is not None:
+        settled = set()
+        while buckets._buckets[i]:
+            frontier = buckets.take(i)
+            settled |= frontier
+            _relax(requests(frontier, True), dist, pred, buckets)
+        _relax(requests(settled, False), dist, pred, buckets)
+        i = buckets.lowest()
+    return dist, pred
+
+
+def _vectorized(graph, source, delta):
+    #Delta-stepping with every frontier relaxed by NumPy array operations
+    numpy = compat.numpy()
+    offsets, targets, weights = graph.as_numpy()
+    n = graph.num_vertices()
+    dist = numpy.full(n, INFINITY, dtype=numpy.int64)
+    pred = numpy.full(n, -1, dtype=numpy.int64)
+    buckets = _Buckets(delta)
+    buckets.move(source, INFINITY, 0)
+    dist[source] = 0
+
+    def relax(vertices, light):
+        frontier = numpy.fromiter(vertices, dtype=numpy.int64, count=len(vertices))
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            return
+        #Index of every edge leaving the frontier, and the vertex it leaves
+        edges = numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts) + numpy.arange(total)
+        sources = numpy.repeat(frontier, counts)
+        w = weights[edges]
+        keep = w <= delta if light else w > delta
+        to = targets[edges][keep].astype(numpy.int64)
+        cost = dist[sources[keep]] + w[keep]
+        frm = sources[keep]
+        #Keep the cheapest request for each target that improves on it
+        order = numpy.lexsort((cost, to))
+        to, cost, frm = to[order], cost[order], frm[order]
+        first = numpy.ones(len(to), dtype=bool)
+        first[1:] = to[1:] != to[:-1]
+        to, cost, frm = to[first], cost[first], frm[first]
+        better = cost < dist[to]
+        to, cost, frm = to[better], cost[better], frm[better]
+        old = dist[to]
+        dist[to] = cost
+        pred[to] = frm
+        for v, before, after in zip(to.tolist(), old.tolist(), cost.tolist()):
+            buckets.move(v, before, after)
+
+    i = buckets.lowest()
+    while i is not None:
+        settled = set()
+        while buckets._buckets[i]:
+            frontier = buckets.take(i)
+            settled |= frontier
+            relax(frontier, True)
+        relax(settled, False)
+        i = buckets.lowest()
+    return array('q', dist.tolist()), array('q', pred.tolist())
+
+
+def delta_stepping(graph, source, delta=None, processes=1, vectorized=None):
+    """Computes the shortest path costs from the vertex with id source to
+    every other vertex of the CSRGraph graph. Returns (dist, pred) arrays as
+    CSRGraph.dijkstra does. delta is the bucket width, the mean edge cost by
+    default. processes above 1 generates relaxation requests in a pool of
+    that many processes. vectorized uses NumPy, and is the default when
+    NumPy is installed and processes is 1"""
+    if delta is None:
+        delta = default_delta(graph)
+    if delta < 1:
+        raise ValueError('delta must be at least 1')
+    if vectorized is None:
+        vectorized = processes == 1 and compat.numpy() is not None
+    if vectorized:
+        if compat.numpy() is None:
+            raise ImportError('vectorized delta-stepping requires NumPy')
+        return _vectorized(graph, source, delta)
+    if processes == 1:
+        return _sequential(graph, source, delta, None, 1)
+    with compat.fork_context().Pool(processes, _init, (graph, delta)) as pool:
+        return _sequential(graph, source, delta, pool, processes)
@@ -0,0 +1,93 @@
+#-----------------------------------------------------------------------------
+# Dynamic shortest path trees ------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#Repair a {vertex: (cost, predecessor)} tree from dijkstra in place after the
+#cost of one edge changes, in the manner of Ramalingam and Reps: only the
+#vertices whose cost or predecessor actually change are visited. children is
+#the {vertex: set of children} index of the tree, which is kept up to date.
+#Heap entries carry the ids of their vertices so that ties never compare
+#Vertex objects. On a directed map the edge runs from x to y only.
+
+from heapq import heappush, heappop
+
+
+def _set(tree, children, v, cost, pred):
+    #Give v a new cost and predecessor, moving it in the children index
+    if v in tree and tree[v][1] is not None:
+        children[tree[v][1]].discard(v)
+    tree[v] = (cost, pred)
+    children.setdefault(v, set())
+    if pred is not None:
+        children[pred].add(v)
+
+
+def decrease(routemap, tree, children, x, y):
+    #Repair tree after the edge between x and y got cheaper. Returns the
+    #number of vertices whose cost changed
+    heap = []
+    count = 0
+    ends = ((x, y),) if routemap.is_directed() else ((x, y), (y, x))
+    for a, b in ends:
+        if a in tree:
+            cost = tree[a][0] + int(routemap._vertices[a][b].element())
+            if b not in tree or cost < tree[b][0]:
+                heappush(heap, (cost, id(b), id(a), b, a))
+    while heap:
+        cost, _, _, v, pred = heappop(heap)
+        if v in tree and cost >= tree[v][0]:
+            continue
+        _set(tree, children, v, cost, pred)
+        count += 1
+        for w, edge in routemap._vertices[v].items():
+            newcost = cost + int(edge.element())
+            if w not in tree or newcost < tree[w][0]:
+                heappush(heap, (newcost, id(w), id(v), w, v))
+    return count
+
+
+def increase(routemap, tree, children, x, y):
+    #Repair tree after the edge between x and y got dearer. Only the subtree
+    #below the edge can change, and only if the edge is in the tree.
+    #Returns the number of vertices in that subtree
+    if y in tree and tree[y][1] is x:
+        top = y
+    elif not routemap.is_directed() and x in tree and tree[x][1] is y:
+        top = x
+    else:
+        return 0
+
+    #Collect the subtree hanging from the edge and cut it off the tree
+    affected = set([top])
+    stack = [top]
+    while stack:
+        for c in children[stack.pop()]:
+            affected.add(c)
+            stack.append(c)
+    old = dict()
+    for v in affected:
+        old[v] = tree.pop(v)
+        if old[v][1] is not None and old[v][1] in children:
+            children[old[v][1]].discard(v)
+
+    #Each affected vertex can be reached directly from the rest of the
+    #tree, whose costs have not changed, or through other affected vertices
+    heap = []
+    for v in affected:
+        for w, edge in routemap._in_vertices[v].items():
+            if w in tree:
+                heappush(heap, (tree[w][0] + int(edge.element()), id(v), id(w), v, w))
+    while heap:
+        cost, _, _, v, pred = heappop(heap)
+        if v in tree:
+            continue
+        _set(tree, children, v, cost, pred)
+        for w, edge in routemap._vertices[v].items():
+            if w in affected and w not in tree:
+                heappush(heap, (cost + int(edge.element()), id(w), id(v), w, v))
+
+    #Anything left over can no longer be reached
+    for v in affected:
+        if v not in tree:
+            children.pop(v, None)
+    return len(affected)
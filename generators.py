@@ -0,0 +1,174 @@
+#-----------------------------------------------------------------------------
+# Synthetic road networks ----------------------------------------------------
+#-----------------------------------------------------------------------------
+
+import math
+import random
+
+from geo import great_circle
+from solution import RouteMap
+
+#Speeds in metres per second for the road classes on generated maps
+SPEEDS = (8.3, 13.9, 22.2, 27.8)
+
+#South west corner of the area generated maps are placed in, and metres per
+#degree of latitude and of longitude there
+ORIGIN = (51.85, -8.55)
+LAT_METRES, LONG_METRES = 111195.0, 68600.0
+
+
+def _grid_point(i, j, spacing):
+    #Return the (lat, long) of the junction in row i and column j of a grid
+    #with spacing metres between junctions, as laid out by grid_map and
+    #grid_file
+    return ORIGIN[0] + i * spacing / LAT_METRES, ORIGIN[1] + j * spacing / LONG_METRES
+
+
+def grid_map(rows, cols, seed=0, spacing=100.0, keep=0.9, oneway=None):
+    #Return a RouteMap laid out as a rows x cols street grid around Cork,
+    #with spacing metres between junctions. Each street is kept with
+    #probability keep and given a random speed, and its weight is the
+    #travel time in tenths of a second like the Cork data. If oneway is
+    #given the map is directed and each street is one-way, in a random
+    #direction, with probability oneway
+    rand = random.Random(seed)
+    routemap = RouteMap(directed=oneway is not None)
+    for i in range(rows):
+        for j in range(cols):
+            lat, long = _grid_point(i, j, spacing)
+            routemap.add_vertex(i * cols + j, lat, long)
+    for i in range(rows):
+        for j in range(cols):
+            x = routemap.get_vertex_by_label(i * cols + j)
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < rows and j + dj < cols and rand.random() < keep:
+                    y = routemap.get_vertex_by_label((i + di) * cols + j + dj)
+                    length = spacing * (1 + rand.random() * 0.2)
+                    cost = 10 * length / rand.choice(SPEEDS)
+                    if oneway is None:
+                        routemap.add_edge(x, y, cost)
+                    elif rand.random() < oneway:
+                        a, b = (x, y) if rand.random() < 0.5 else (y, x)
+                        routemap.add_edge(a, b, cost)
+                    else:
+                        routemap.add_edge(x, y, cost)
+                        routemap.add_edge(y, x, cost)
+    return routemap
+
+
+#Route files ---------------------------------------------------------------
+
+#The writers below stream their graphs straight to a route file in the
+#Node/Edge format read by loader.load, so maps far larger than memory would
+#allow as a RouteMap can be produced. Each returns (vertices, edges) written.
+
+
+class _RouteFile:
+
+    """Writes Node and Edge records to an open file"""
+
+    def __init__(self, file, rand, oneway):
+        self._file = file
+        self._rand = rand
+        self._oneway = oneway
+        self.vertices = 0
+        self.edges = 0
+
+    def node(self, elt, lat, long):
+        self._file.write('Node\nid: %i\ngps: %.6f %.6f\n' % (elt, lat, long))
+        self.vertices += 1
+
+    def edge(self, a, b, length):
+        #Write a road of length metres from a to b with a random speed
+        time = 10 * length / self._rand.choice(SPEEDS)
+        flag = 'Y' if self._oneway and self._rand.random() < self._oneway else 'N'
+        self._file.write('Edge\nfrom: %i\nto: %i\nlength: %.2f\ntime: %.2f\noneway: %s\n'
+                         % (a, b, length, time, flag))
+        self.edges += 1
+
+
+def grid_file(filename, rows, cols, seed=0, spacing=100.0, keep=0.9, oneway=0.0):
+    #Write a street grid laid out as in grid_map to filename. Each street is
+    #marked one-way with probability oneway
+    rand = random.Random(seed)
+    with open(filename, 'w') as file:
+        out = _RouteFile(file, rand, oneway)
+        for i in range(rows):
+            for j in range(cols):
+                lat, long = _grid_point(i, j, spacing)
+                out.node(i * cols + j, lat, long)
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in ((0, 1), (1, 0)):
+                    if i + di < rows and j + dj < cols and rand.random() < keep:
+                        out.edge(i * cols + j, (i + di) * cols + j + dj,
+                                 spacing * (1 + rand.random() * 0.2))
+    return out.vertices, out.edges
+
+
+def _points(n, side, rand):
+    #Return n random (lat, long) points in a square of side metres
+    return [(ORIGIN[0] + rand.random() * side / LAT_METRES,
+             ORIGIN[1] + rand.random() * side / LONG_METRES) for _ in range(n)]
+
+
+def _road(a, b):
+    #Length of a road between two points, a little longer than the straight
+    #line and never zero
+    return max(1.0, great_circle(a[0], a[1], b[0], b[1]) * 1.2)
+
+
+def geometric_file(filename, n, degree=6, seed=0, spacing=100.0, oneway=0.0):
+    #Write a random geometric graph to filename: n junctions scattered over
+    #a square with about spacing metres between neighbours, and a road
+    #between every pair closer than the radius that gives each junction
+    #degree roads on average
+    rand = random.Random(seed)
+    side = spacing * math.sqrt(n)
+    radius = spacing * math.sqrt(degree / math.pi)
+    points = _points(n, side, rand)
+    #Bucket the points by cell of the radius so only nearby pairs are tried
+    cells = dict()
+    for i in range(n):
+        lat, long = points[i]
+        cell = (int((lat - ORIGIN[0]) * LAT_METRES // radius),
+                int((long - ORIGIN[1]) * LONG_METRES // radius))
+        cells.setdefault(cell, []).append(i)
+    with open(filename, 'w') as file:
+        out = _RouteFile(file, rand, oneway)
+        for i in range(n):
+            out.node(i, points[i][0], points[i][1])
+        for (ci, cj), members in cells.items():
+            for di in (-1, 0, 1):
+                for dj in (-1, 0, 1):
+                    for j in cells.get((ci + di, cj + dj), ()):
+                        for i in members:
+                            if i < j:
+                                length = great_circle(points[i][0], points[i][1],
+                                                      points[j][0], points[j][1])
+                                if length <= radius:
+                                    out.edge(i, j, _road(points[i], points[j]))
+    return out.vertices, out.edges
+
+
+def scale_free_file(filename, n, links=3, seed=0, spacing=100.0, oneway=0.0):
+    #Write a Barabasi-Albert scale-free graph to filename: each new junction
+    #is joined to links existing ones chosen in proportion to their degree.
+    #Junctions are scattered at random, so roads can be long
+    rand = random.Random(seed)
+    points = _points(n, spacing * math.sqrt(n), rand)
+    with open(filename, 'w') as file:
+        out = _RouteFile(file, rand, oneway)
+        for i in range(n):
+            out.node(i, points[i][0], points[i][1])
+        #Every end of every edge so far, so a uniform pick is by degree
+        ends = list(range(min(links, n)))
+        for i in range(min(links, n), n):
+            chosen = set()
+            while len(chosen) < links:
+                chosen.add(rand.choice(ends))
+            for j in chosen:
+                out.edge(j, i, _road(points[j], points[i]))
+                ends.append(j)
+                ends.append(i)
+    return out.vertices, out.edges
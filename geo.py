@@ -0,0 +1,262 @@
+#-----------------------------------------------------------------------------
+# Geographic helpers ---------------------------------------------------------
+#-----------------------------------------------------------------------------
+
+from math import radians, sin, cos, asin, sqrt, atan2, pi
+
+#Mean radius of the earth in metres
+EARTH_RADIUS = 6371008.8
+
+
+def great_circle(lat1, long1, lat2, long2):
+    #Return the great-circle distance in metres between two points given in
+    #degrees, using the haversine formula
+    lat1, long1, lat2, long2 = radians(lat1), radians(long1), radians(lat2), radians(long2)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((long2 - long1) / 2) ** 2
+    return 2 * EARTH_RADIUS * asin(min(1.0, sqrt(a)))
+
+
+class GridIndex:
+
+    """Uniform grid of points for nearest neighbour and radius queries
+
+       Points are projected onto a flat plane in metres (equirectangular,
+       about the latitude of the first point added) and bucketed into
+       square cells of cell_size metres. Distances are measured on that
+       plane, which is accurate to well under one percent across a city or
+       region. Points can be added and removed at any time.
+    """
+
+    def __init__(self, cell_size=250.0):
+        self._cell_size = cell_size
+        self._cells = dict()
+        self._where = dict()
+        self._scale = None
+
+    def _project(self, lat, long):
+        if self._scale is None:
+            self._scale = cos(radians(lat))
+        return (EARTH_RADIUS * radians(long) * self._scale, EARTH_RADIUS * radians(lat))
+
+    def _cell(self, x, y):
+        return (int(x // self._cell_size), int(y // self._cell_size))
+
+    def add(self, item, lat, long):
+        #Add item at the given position, moving it if it is already present
+        if item in self._where:
+            self.remove(item)
+        x, y = self._project(lat, long)
+        cell = self._cell(x, y)
+        if cell not in self._cells:
+            self._cells[cell] = dict()
+        self._cells[cell][item] = (x, y)
+        self._where[item] = cell
+
+    def remove(self, item):
+        #Remove item from the index if it is present
+        cell = self._where.pop(item, None)
+        if cell is not None:
+            del self._cells[cell][item]
+            if not self._cells[cell]:
+                del self._cells[cell]
+
+    def __len__(self):
+        return len(self._where)
+
+    def _ring(self, cx, cy, r):
+        #Return the cells at Chebyshev distance r from (cx, cy)
+        if r == 0:
+            return [(cx, cy)]
+        cells = []
+        for i in range(-r, r + 1):
+            cells.append((cx + i, cy - r))
+            cells.append((cx + i, cy + r))
+        for j in range(-r + 1, r):
+            cells.append((cx - r, cy + j))
+            cells.append((cx + r, cy + j))
+        return cells
+
+    def k_nearest(self, lat, long, k):
+        #Return up to k (item, distance) pairs closest to the position,
+        #nearest first
+        if not self._where or k <= 0:
+            return []
+        x, y = self._project(lat, long)
+        cx, cy = self._cell(x, y)
+        found = []
+        r = 0
+        while True:
+            if (2 * r + 1) ** 2 > len(self._cells):
+                #The rings now cover more cells than are occupied, so it is
+                #quicker to look at every occupied cell directly
+                found = []
+                for points in self._cells.values():
+                    for item, (px, py) in points.items():
+                        found.append((sqrt((px - x) ** 2 + (py - y) ** 2), item))
+                break
+            for cell in self._ring(cx, cy, r):
+                for item, (px, py) in self._cells.get(cell, {}).items():
+                    found.append((sqrt((px - x) ** 2 + (py - y) ** 2), item))
+            #Cells beyond ring r are at least r cells away from the position
+            if len(found) >= k:
+                found.sort(key=lambda pair: pair[0])
+                if found[k-1][0] <= r * self._cell_size:
+                    break
+            r += 1
+        found.sort(key=lambda pair: pair[0])
+        return [(item, distance) for distance, item in found[:k]]
+
+    def nearest(self, lat, long):
+        #Return the item closest to the position, or None if there are none
+        found = self.k_nearest(lat, long, 1)
+        if found:
+            return found[0][0]
+        return None
+
+    def within(self, lat, long, radius):
+        #Return (item, distance) pairs for every item within radius metres
+        #of the position, nearest first
+        if not self._where:
+            return []
+        x, y = self._project(lat, long)
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        found = []
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            cells = self._cells.values()
+        else:
+            cells = [self._cells[(i, j)] for i in range(x0, x1 + 1)
+                     for j in range(y0, y1 + 1) if (i, j) in self._cells]
+        for points in cells:
+            for item, (px, py) in points.items():
+                distance = sqrt((px - x) ** 2 + (py - y) ** 2)
+                if distance <= radius:
+                    found.append((distance, item))
+        found.sort(key=lambda pair: pair[0])
+        return [(item, distance) for distance, item in found]
+
+
+#Polygons -------------------------------------------------------------------
+
+def _plane(points):
+    #Return a function mapping (lat, long) to (x, y) on a plane where one
+    #unit is roughly the same distance in both directions
+    scale = cos(radians(sum(p[0] for p in points) / len(points)))
+    return lambda p: (p[1] * scale, p[0])
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points):
+    #Return the convex hull of a list of (lat, long) points as a list of
+    #points in anticlockwise order, using Andrew's monotone chain
+    points = list(set(points))
+    if len(points) < 3:
+        return points
+    plane = _plane(points)
+    order = sorted(points, key=plane)
+    lower = []
+    upper = []
+    for p in order:
+        while len(lower) >= 2 and _cross(plane(lower[-2]), plane(lower[-1]), plane(p)) <= 0:
+            lower.pop()
+        lower.append(p)
+    for p in reversed(order):
+        while len(upper) >= 2 and _cross(plane(upper[-2]), plane(upper[-1]), plane(p)) <= 0:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def _intersects(a, b, c, d):
+    #Return True if segment ab properly crosses segment cd
+    d1, d2 = _cross(c, d, a), _cross(c, d, b)
+    d3, d4 = _cross(a, b, c), _cross(a, b, d)
+    return ((d1 > 0) != (d2 > 0) and d1 != 0 and d2 != 0 and
+            (d3 > 0) != (d4 > 0) and d3 != 0 and d4 != 0)
+
+
+def _inside(p, polygon):
+    #Return True if p is inside or on the boundary of polygon
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        a, b = polygon[i], polygon[(i + 1) % n]
+        if _cross(a, b, p) == 0 and min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) \
+                and min(a[1], b[1]) <= p[1] <= max(a[1], b[1]):
+            return True
+        if (a[1] > p[1]) != (b[1] > p[1]):
+            x = a[0] + (p[1] - a[1]) * (b[0] - a[0]) / (b[1] - a[1])
+            if p[0] < x:
+                inside = not inside
+    return inside
+
+
+def _clockwise_angle(frm, to):
+    #Angle in radians turned clockwise from direction frm to direction to
+    angle = (atan2(frm[1], frm[0]) - atan2(to[1], to[0])) % (2 * pi)
+    return angle
+
+
+def _knn_hull(points, k):
+    #One attempt at the k-nearest neighbours concave hull of Moreira and
+    #Santos over distinct (x, y) points. Returns None if the hull it finds
+    #crosses itself or leaves points outside
+    first = min(points, key=lambda p: (p[1], p[0]))
+    hull = [first]
+    remaining = set(points)
+    remaining.discard(first)
+    back = (-1.0, 0.0)
+    current = first
+    while True:
+        if len(hull) == 4:
+            #The hull may now be closed
+            remaining.add(first)
+        near = sorted(remaining, key=lambda p: (p[0] - current[0]) ** 2 + (p[1] - current[1]) ** 2)[:k]
+        #Try the sharpest right turns first so the hull hugs the points
+        near.sort(key=lambda p: -_clockwise_angle(back, (p[0] - current[0], p[1] - current[1])))
+        chosen = None
+        for p in near:
+            closing = 1 if p == first else 0
+            if not any(_intersects(current, p, hull[m], hull[m+1])
+                       for m in range(closing, len(hull) - 2)):
+                chosen = p
+                break
+        if chosen is None:
+            return None
+        if chosen == first:
+            break
+        back = (current[0] - chosen[0], current[1] - chosen[1])
+        current = chosen
+        hull.append(current)
+        remaining.discard(current)
+        if not remaining:
+            return None
+    for p in remaining:
+        if p != first and not _inside(p, hull):
+            return None
+    return hull
+
+
+def concave_hull(points, k=3, max_k=25):
+    #Return a concave hull of a list of (lat, long) points as a list of
+    #points, following the points more closely than the convex hull. k is
+    #the number of neighbours considered at each step, and is raised until
+    #a simple polygon enclosing every point is found. Falls back to the
+    #convex hull if none is found by max_k
+    points = list(set(points))
+    if len(points) < 4:
+        return convex_hull(points)
+    plane = _plane(points)
+    back = dict()
+    for p in points:
+        back[plane(p)] = p
+    k = max(k, 3)
+    while k <= min(max_k, len(points) - 1):
+        hull = _knn_hull(list(back), k)
+        if hull is not None:
+            return [back[p] for p in hull]
+        k += 1
+    return convex_hull(points)
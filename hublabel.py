@@ -0,0 +1,254 @@
+#-----------------------------------------------------------------------------
+# Hub labels for distance queries --------------------------------------------
+#-----------------------------------------------------------------------------
+
+from array import array
+from heapq import heappush, heappop
+
+from snapshot import vertex_ids, save_arrays, load_arrays
+
+#Bumped whenever the layout written by HubLabels.save changes. Version 1
+#files were pickles and are no longer read
+FORMAT_VERSION = 2
+MAGIC = b'RMAPHUBS'
+
+#Orders the hubs can be taken in by HubLabels.build
+ORDERS = ('degree', 'ch')
+
+#Cost through a hub that is not in the label being compared against
+_NEVER = float('inf')
+
+
+class HubLabels:
+
+    """Hub labels (a 2-hop cover) over a RouteMap, built by pruned landmark
+       labelling
+
+       Every vertex gets a label of (hub, cost) pairs such that for any two
+       vertices some hub on a shortest path between them is in both labels.
+       The cost between them is then the smallest sum over the hubs the two
+       labels share, found by merging them, with no search at all. Vertices
+       are taken as hubs most important first, each with a Dijkstra search
+       that stops wherever the labels so far already give the right cost,
+       so later searches are small. On a directed map each vertex has an
+       out label of hubs it can reach and an in label of hubs that can
+       reach it. On an undirected map the two are the same.
+
+       Attributes:
+       self._labels : vertex elements, indexed by internal id
+       self._ids : dict from Vertex to internal id
+       self._order : the hub order used, one of ORDERS
+       self._out_offsets, self._out_hubs, self._out_costs : the out label
+       of id i is the hubs out_hubs[out_offsets[i]:out_offsets[i+1]], in
+       increasing order, with matching costs in out_costs. Hubs are
+       numbered by the order they were taken in
+       self._in_offsets, self._in_hubs, self._in_costs : the same for the
+       in labels, which are the out label arrays themselves if the map is
+       undirected
+
+       Methods:
+       build : compute the labels of every vertex
+       distance : cost of the shortest path between two vertices
+       path : the shortest path itself, found by a search it bounds
+       num_entries, nbytes : size of the labels
+       save, load : write the labels to disk and read them back
+    """
+
+    def __init__(self, routemap):
+        self._routemap = routemap
+        self._labels, self._ids = vertex_ids(routemap)
+        self._order = None
+        self._out_offsets = self._in_offsets = array('l', [0]) * (len(self._labels) + 1)
+        self._out_hubs = self._in_hubs = array('l')
+        self._out_costs = self._in_costs = array('q')
+
+    #Preprocessing -----------------------------------------
+
+    def _graph(self):
+        #Return the out and in adjacency of the map as lists of
+        #{neighbour: weight} dicts, which are the same list if it is
+        #undirected
+        routemap = self._routemap
+        out = [dict() for _ in self._labels]
+        into = [dict() for _ in self._labels] if routemap.is_directed() else out
+        for v, i in self._ids.items():
+            for edge in routemap.get_edges(v):
+                j = self._ids[edge.opposite(v)]
+                weight = int(edge.element())
+                if i != j and (j not in out[i] or weight < out[i][j]):
+                    out[i][j] = weight
+                    into[j][i] = weight
+        return out, into
+
+    def _ranking(self, order):
+        #Return the ids in the order they are to be taken as hubs
+        n = len(self._labels)
+        if order == 'degree':
+            routemap = self._routemap
+            vertex = routemap.get_vertex_by_label
+            degree = [routemap.degree(vertex(label)) for label in self._labels]
+            return sorted(range(n), key=lambda i: -degree[i])
+        hierarchy = self._routemap._hierarchy
+        if hierarchy is None:
+            raise ValueError('No contraction hierarchy, call contract first')
+        #Vertices contracted last lie on the most shortest paths
+        rank = [hierarchy._rank[hierarchy._ids[v]] for v in self._routemap.vertices()]
+        ids = [self._ids[v] for v in self._routemap.vertices()]
+        return [ids[k] for k in sorted(range(n), key=lambda k: -rank[k])]
+
+    def _prune(self, source, hub, adjacency, grow, known, through):
+        #Search from id source, which is hub number hub, along adjacency,
+        #adding (hub, cost) to the labels in grow of every vertex reached,
+        #except that the search stops at a vertex wherever the labels in
+        #known of the hub and grow of the vertex already give a cost that
+        #low. through is all _NEVER, and is left that way
+        hubs, costs = known[0][source], known[1][source]
+        for k in range(len(hubs)):
+            through[hubs[k]] = costs[k]
+        dist = {source: 0}
+        heap = [(0, source)]
+        while heap:
+            d, x = heappop(heap)
+            if d > dist[x]:
+                continue
+            xhubs, xcosts = grow[0][x], grow[1][x]
+            covered = False
+            for k in range(len(xhubs)):
+                if through[xhubs[k]] + xcosts[k] <= d:
+                    covered = True
+                    break
+            if covered:
+                continue
+            xhubs.append(hub)
+            xcosts.append(d)
+            for y, weight in adjacency[x].items():
+                nd = d + weight
+                if y not in dist or nd < dist[y]:
+                    dist[y] = nd
+                    heappush(heap, (nd, y))
+        for h in hubs:
+            through[h] = _NEVER
+
+    def build(self, order='degree'):
+        """Computes the labels of every vertex, taking the vertices as hubs
+        in order of degree, highest first, or for 'ch' in the reverse of
+        the contraction order of the hierarchy built by the RouteMap's
+        contract, which gives far smaller labels on road maps"""
+        if order not in ORDERS:
+            raise ValueError('Unknown hub order: %s' % order)
+        n = len(self._labels)
+        out, into = self._graph()
+        ranking = self._ranking(order)
+        #Cost from or to the current hub through each hub, read from its
+        #own label while it is searched from
+        through = [_NEVER] * n
+        #Labels as (hubs, costs) lists by id while they are being built
+        outs = ([[] for _ in range(n)], [[] for _ in range(n)])
+        ins = ([[] for _ in range(n)], [[] for _ in range(n)]) if into is not out else outs
+        for hub in range(n):
+            #Forwards from the hub its cost to each vertex goes in their in
+            #labels, and backwards its cost from each goes in their out labels
+            self._prune(ranking[hub], hub, out, ins, outs, through)
+            if ins is not outs:
+                self._prune(ranking[hub], hub, into, outs, ins, through)
+        self._order = order
+        self._out_offsets, self._out_hubs, self._out_costs = self._pack(outs)
+        if ins is outs:
+            self._in_offsets, self._in_hubs, self._in_costs = \
+                self._out_offsets, self._out_hubs, self._out_costs
+        else:
+            self._in_offsets, self._in_hubs, self._in_costs = self._pack(ins)
+
+    def _pack(self, labels):
+        #Pack (hubs, costs) lists by id into flat arrays. Hubs were added in
+        #the order they were taken, so each label is already sorted
+        offsets = array('l', [0])
+        hubs = array('l')
+        costs = array('q')
+        for i in range(len(labels[0])):
+            hubs.extend(labels[0][i])
+            costs.extend(labels[1][i])
+            offsets.append(len(hubs))
+        return offsets, hubs, costs
+
+    def num_entries(self):
+        #Return the total number of (hub, cost) pairs in all the labels
+        if self._in_hubs is self._out_hubs:
+            return len(self._out_hubs)
+        return len(self._out_hubs) + len(self._in_hubs)
+
+    def nbytes(self):
+        #Return the bytes taken by the label arrays
+        arrays = [self._out_offsets, self._out_hubs, self._out_costs]
+        if self._in_hubs is not self._out_hubs:
+            arrays += [self._in_offsets, self._in_hubs, self._in_costs]
+        return sum(len(a) * a.itemsize for a in arrays)
+
+    #Query -------------------------------------------------
+
+    def distance(self, v, w):
+        #Return the cost of the shortest path from v to w, or None if there
+        #is none, by merging the out label of v with the in label of w
+        a, b = self._ids[v], self._ids[w]
+        i, iend = self._out_offsets[a], self._out_offsets[a+1]
+        j, jend = self._in_offsets[b], self._in_offsets[b+1]
+        out_hubs, out_costs = self._out_hubs, self._out_costs
+        in_hubs, in_costs = self._in_hubs, self._in_costs
+        best = None
+        while i < iend and j < jend:
+            x, y = out_hubs[i], in_hubs[j]
+            if x == y:
+                cost = out_costs[i] + in_costs[j]
+                if best is None or cost < best:
+                    best = cost
+                i += 1
+                j += 1
+            elif x < y:
+                i += 1
+            else:
+                j += 1
+        return best
+
+    def path(self, v, w):
+        #Return the route from v to w in the form RouteMap.sp returns, or
+        #None if there is none. The cost from the labels bounds the
+        #RouteMap's own dijkstra, so it searches no further than it must
+        cost = self.distance(v, w)
+        if cost is None:
+            return None
+        routemap = self._routemap
+        closed = routemap.dijkstra(v, w, max_cost=cost)
+        return routemap._legs(routemap._walk(closed, v, w))
+
+    #Persistence -------------------------------------------
+
+    def save(self, filename):
+        #Write the labels to filename in the layout of snapshot.save_arrays.
+        #The order is written as its index in ORDERS, and the in labels
+        #only for a directed map
+        directed = self._in_hubs is not self._out_hubs
+        order = ORDERS.index(self._order) if self._order in ORDERS else -1
+        arrays = [self._labels, [order, int(directed)],
+                  self._out_offsets, self._out_hubs, self._out_costs]
+        if directed:
+            arrays += [self._in_offsets, self._in_hubs, self._in_costs]
+        save_arrays(filename, MAGIC, FORMAT_VERSION, arrays)
+
+    @classmethod
+    def load(cls, filename, routemap):
+        #Read labels written by save and attach them to routemap, which must
+        #be the map they were built for
+        _, arrays = load_arrays(filename, MAGIC, (FORMAT_VERSION,), 'hub label file')
+        if len(arrays) < 2 or len(arrays) != (8 if arrays[1][1] else 5):
+            raise ValueError('%s is truncated or corrupt' % filename)
+        (order, directed), out = arrays[1], arrays[2:5]
+        if routemap.is_directed() and not directed:
+            raise ValueError('Hub labels were built for an undirected map')
+        labels = cls.__new__(cls)
+        labels._routemap = routemap
+        labels._labels, labels._ids = vertex_ids(routemap, arrays[0])
+        labels._order = ORDERS[order] if order >= 0 else None
+        labels._out_offsets, labels._out_hubs, labels._out_costs = out
+        labels._in_offsets, labels._in_hubs, labels._in_costs = arrays[5:8] if directed else out
+        return labels
+
@@ -0,0 +1,251 @@
+#-----------------------------------------------------------------------------
+# Search instrumentation -----------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#The searches take an optional stats argument. Passing a SearchStats turns on
+#instrumentation for that call: the priority queue is wrapped in a
+#CountingQueue, phases are timed, and the finished stats are handed to the
+#SearchStats' own callback and to every callback added with register. With
+#stats left as None the searches run exactly as before, since nothing is
+#wrapped and the inner loops do no extra work. A plain dict is still
+#accepted and only gets stats['settled'] and stats['scanned'].
+
+import json
+import time
+
+
+class SearchStats:
+
+    """Counters for one search
+
+       Attributes:
+       algorithm : name of the outermost search that filled the stats in
+       settled : vertices settled
+       scanned : edges looked at from settled vertices, worked out
+       afterwards from their degrees
+       pushes, pops, decrease_keys : priority queue operations
+       peak_queue : most elements held at once by any one queue
+       phases : dict from phase name to seconds spent in it
+       seconds : wall time of the whole search
+
+       The counters can also be read and set like dict entries, so a
+       SearchStats can stand in wherever a stats dict was passed before.
+    """
+
+    COUNTERS = ('settled', 'scanned', 'pushes', 'pops', 'decrease_keys', 'peak_queue')
+
+    def __init__(self, callback=None):
+        self.algorithm = None
+        self.settled = 0
+        self.scanned = 0
+        self.pushes = 0
+        self.pops = 0
+        self.decrease_keys = 0
+        self.peak_queue = 0
+        self.phases = dict()
+        self.seconds = 0.0
+        #Called with the stats once the outermost search finishes
+        self.callback = callback
+        self._depth = 0
+        self._start = 0.0
+
+    def __getitem__(self, name):
+        if name not in self.COUNTERS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        if name not in self.COUNTERS:
+            raise KeyError(name)
+        setattr(self, name, value)
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def as_dict(self):
+        result = {'algorithm': self.algorithm, 'seconds': self.seconds, 'phases': dict(self.phases)}
+        for name in self.COUNTERS:
+            result[name] = getattr(self, name)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), sort_keys=True)
+
+    def to_prometheus(self, prefix='routemap_search'):
+        #Return the stats as Prometheus text exposition format gauges
+        label = '{algorithm="%s"}' % (self.algorithm or '')
+        lines = []
+        for name in self.COUNTERS:
+            lines.append('# TYPE %s_%s gauge' % (prefix, name))
+            lines.append('%s_%s%s %s' % (prefix, name, label, getattr(self, name)))
+        lines.append('# TYPE %s_seconds gauge' % prefix)
+        lines.append('%s_seconds%s %r' % (prefix, label, self.seconds))
+        lines.append('# TYPE %s_phase_seconds gauge' % prefix)
+        for phase in sorted(self.phases):
+            lines.append('%s_phase_seconds{algorithm="%s",phase="%s"} %r'
+                         % (prefix, self.algorithm or '', phase, self.phases[phase]))
+        return '\n'.join(lines) + '\n'
+
+    def __repr__(self):
+        return 'SearchStats(%s)' % ', '.join('%s=%s' % (k, v) for k, v in sorted(self.as_dict().items()))
+
+
+class CountingQueue:
+
+    """Wraps a priority queue and counts the operations on it into a
+       SearchStats. It has the interface of apq.APQ, including the _length
+       attribute the searches read"""
+
+    def __init__(self, queue, stats):
+        self._queue = queue
+        self._stats = stats
+
+    @property
+    def _length(self):
+        return self._queue._length
+
+    def add(self, key, item):
+        element = self._queue.add(key, item)
+        stats = self._stats
+        stats.pushes += 1
+        if self._queue._length > stats.peak_queue:
+            stats.peak_queue = self._queue._length
+        return element
+
+    def min(self):
+        return self._queue.min()
+
+    def remove_min(self):
+        self._stats.pops += 1
+        return self._queue.remove_min()
+
+    def update_key(self, element, newkey):
+        self._stats.decrease_keys += 1
+        return self._queue.update_key(element, newkey)
+
+    def remove(self, element):
+        return self._queue.remove(element)
+
+    def get_key(self, element):
+        return self._queue.get_key(element)
+
+    def is_empty(self):
+        return self._queue.is_empty()
+
+    def length(self):
+        return self._queue.length()
+
+
+class Collector:
+
+    """Callback that adds up the SearchStats of many searches by algorithm,
+       to be registered with register and scraped as Prometheus text or
+       JSON"""
+
+    def __init__(self, prefix='routemap'):
+        self._prefix = prefix
+        self._totals = dict()
+
+    def __call__(self, stats):
+        totals = self._totals.get(stats.algorithm)
+        if totals is None:
+            totals = self._totals[stats.algorithm] = dict.fromkeys(
+                ('searches', 'seconds') + SearchStats.COUNTERS, 0)
+        totals['searches'] += 1
+        totals['seconds'] += stats.seconds
+        for name in SearchStats.COUNTERS:
+            if name == 'peak_queue':
+                totals[name] = max(totals[name], stats.peak_queue)
+            else:
+                totals[name] += getattr(stats, name)
+
+    def totals(self):
+        #Return {algorithm: {counter: total}}
+        return dict((a, dict(t)) for a, t in self._totals.items())
+
+    def to_json(self):
+        return json.dumps(self.totals(), sort_keys=True)
+
+    def to_prometheus(self):
+        #Return the totals as Prometheus text exposition format. Everything
+        #is a counter except the largest queue seen, which is a gauge
+        lines = []
+        names = ('searches', 'seconds') + SearchStats.COUNTERS
+        for name in names:
+            kind = 'gauge' if name == 'peak_queue' else 'counter'
+            metric = '%s_%s' % (self._prefix, name if kind == 'gauge' else name + '_total')
+            lines.append('# TYPE %s %s' % (metric, kind))
+            for algorithm in sorted(self._totals, key=str):
+                lines.append('%s{algorithm="%s"} %r' % (metric, algorithm or '', self._totals[algorithm][name]))
+        return '\n'.join(lines) + '\n'
+
+
+#Callbacks given every finished SearchStats
+_callbacks = []
+
+
+def register(callback):
+    #Call callback with the SearchStats of every instrumented search from
+    #now on. Returns callback, so it can be used as a decorator
+    _callbacks.append(callback)
+    return callback
+
+
+def unregister(callback):
+    _callbacks.remove(callback)
+
+
+#Hooks used by the searches ------------------------------------------------
+
+def counting(make, stats):
+    #Return a queue factory counting into stats if instrumentation is on,
+    #or make itself if not
+    if not isinstance(stats, SearchStats):
+        return make
+    return lambda: CountingQueue(make(), stats)
+
+
+def clock(stats):
+    #Return the time now if instrumentation is on, otherwise None
+    return time.perf_counter() if isinstance(stats, SearchStats) else None
+
+
+def phase(stats, name, start):
+    #Add the time since start, from clock, to the named phase
+    if start is not None:
+        stats.add_phase(name, time.perf_counter() - start)
+
+
+def scanned(adjacency, vertices, skip=None):
+    #Return the number of edges looked at by a search that settled
+    #vertices, each of which scans its dict in adjacency, except skip, the
+    #target it stopped at
+    total = 0
+    for v in vertices:
+        total += len(adjacency[v])
+    if skip is not None and skip in vertices:
+        total -= len(adjacency[skip])
+    return total
+
+
+def begin(stats):
+    #Mark the start of a search. Searches may call one another, and only
+    #the outermost one is timed as a whole and published
+    if isinstance(stats, SearchStats):
+        if stats._depth == 0:
+            stats._start = time.perf_counter()
+        stats._depth += 1
+
+
+def end(stats, algorithm):
+    #Mark the end of a search started with begin, publishing the stats if
+    #it was the outermost
+    if isinstance(stats, SearchStats):
+        stats._depth -= 1
+        if stats._depth == 0:
+            stats.seconds = time.perf_counter() - stats._start
+            stats.algorithm = algorithm
+            if stats.callback is not None:
+                stats.callback(stats)
+            for callback in _callbacks:
+                callback(stats)
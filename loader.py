@@ -0,0 +1,249 @@
+#-----------------------------------------------------------------------------
+# Route file loader ----------------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#Route files are a list of records. Each record is a 'Node' or 'Edge' line
+#followed by one 'name: value' line per field:
+#  Node: id, then gps (latitude longitude) in route map files
+#  Edge: from, to, length, time, then the one-way flag, Y or N
+#Graph files have no gps or time fields. A Graph is weighted by length and a
+#RouteMap by time, as in graphreader and graphreader2. A directed graph gets
+#an edge each way for every road that is not one-way, and undirected graphs
+#ignore the flag.
+
+import gc
+import os
+import time
+
+#Characters read from the file at a time
+CHUNK_SIZE = 1 << 24
+
+#Position of each value within the tokens of a record, counting the 'Node'
+#or 'Edge' token as 0
+NODE_ID, NODE_LAT, NODE_LONG = 2, 4, 5
+EDGE_FROM, EDGE_TO, EDGE_LENGTH, EDGE_TIME = 2, 4, 6, 8
+#The one-way flag follows the time in route map files and the length in
+#graph files, so it is found by its name
+ONEWAY_FIELD = 'oneway:'
+
+#Values of the one-way field, and whether each marks a one-way road
+ONEWAY = {'Y': True, 'N': False}
+
+
+class LoadReport:
+
+    """Element counts and timings from loading a route file
+
+       Attributes:
+       filename, bytes : the file read and its size
+       vertices : number of Node records loaded
+       edges : number of Edge records added to the graph
+       skipped : number of Edge records not added because a vertex at one
+       of their ends is missing
+       oneway : number of Edge records marked one-way
+       parse_seconds : time spent reading and splitting the file
+       build_seconds : time spent adding vertices and edges to the graph
+       seconds : total time taken
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.bytes = 0
+        self.vertices = 0
+        self.edges = 0
+        self.skipped = 0
+        self.oneway = 0
+        self.parse_seconds = 0.0
+        self.build_seconds = 0.0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return {'filename': self.filename,
+                'bytes': self.bytes,
+                'vertices': self.vertices,
+                'edges': self.edges,
+                'skipped': self.skipped,
+                'oneway': self.oneway,
+                'parse_seconds': self.parse_seconds,
+                'build_seconds': self.build_seconds,
+                'seconds': self.seconds}
+
+    def __str__(self):
+        return ('%s: %i vertices, %i edges (%i skipped), %i bytes in %.3fs (parse %.3fs, build %.3fs)'
+                % (self.filename, self.vertices, self.edges, self.skipped, self.bytes,
+                   self.seconds, self.parse_seconds, self.build_seconds))
+
+
+def _strided(tokens, start, end, header, count):
+    #If the count records from start to end all have the same number of
+    #tokens, return that number, otherwise None
+    if count == 0 or (end - start) % count != 0:
+        return None
+    stride = (end - start) // count
+    if tokens[start:end:stride].count(header) != count:
+        return None
+    return stride
+
+
+def _records(tokens):
+    #Slow path for irregular files: return a list of token lists, one per
+    #record, padding every record to the same layout
+    records = []
+    for token in tokens:
+        if token == 'Node' or token == 'Edge':
+            record = [token]
+            records.append(record)
+        elif token[-1] == ':' and len(record) % 2 == 0:
+            #A field with no value, so pad it
+            record.append(None)
+            record.append(token)
+        else:
+            record.append(token)
+    return records
+
+
+def _parse(text):
+    """Splits text, made of whole records, into columns. Returns a list of
+    token lists for the nodes and one for the edges, each list holding one
+    value per record. Files where every node and every edge has the same
+    layout, like those written by the readers' counterparts, are split
+    with slicing alone"""
+    tokens = text.split()
+    nodes = tokens.count('Node')
+    edges = tokens.count('Edge')
+    first_edge = tokens.index('Edge') if edges else len(tokens)
+    node_stride = _strided(tokens, 0, first_edge, 'Node', nodes) if nodes else 0
+    edge_stride = _strided(tokens, first_edge, len(tokens), 'Edge', edges) if edges else 0
+    if node_stride is not None and edge_stride is not None:
+        node_part = tokens[:first_edge]
+        edge_part = tokens[first_edge:]
+        return ([node_part[k::node_stride] for k in range(node_stride)],
+                [edge_part[k::edge_stride] for k in range(edge_stride)])
+    #Mixed layouts, so fall back to one record at a time
+    node_records = []
+    edge_records = []
+    for record in _records(tokens):
+        if record[0] == 'Node':
+            node_records.append(record)
+        else:
+            edge_records.append(record)
+    return _columns(node_records), _columns(edge_records)
+
+
+def _columns(records):
+    #Turn a list of records into a list of columns, padding short records
+    width = max([len(r) for r in records] + [0])
+    return [[r[k] if k < len(r) else None for r in records] for k in range(width)]
+
+
+def _flags(edges, directed):
+    #Return a list of whether each edge is one-way. A directed graph cannot
+    #be built without the flags, while undirected graphs do not need them
+    column = None
+    for k in range(1, len(edges) - 1, 2):
+        if edges[k][0] == ONEWAY_FIELD:
+            column = k + 1
+    if column is None:
+        if directed:
+            raise ValueError('Edge records have no oneway field to build a directed graph from')
+        return [False] * len(edges[0])
+    try:
+        return [ONEWAY[flag] for flag in edges[column]]
+    except KeyError as error:
+        if directed:
+            raise ValueError('Unknown oneway value: %s' % error.args[0])
+        return [flag == 'Y' for flag in edges[column]]
+
+
+def _build(graph, nodes, edges, coords):
+    #Add the vertices and edges held in columns to graph. Returns the
+    #numbers of edge records added, of those skipped because a vertex is
+    #missing, and of one-way edges
+    if nodes:
+        if coords:
+            for elt, lat, long in zip(map(int, nodes[NODE_ID]), map(float, nodes[NODE_LAT]),
+                                      map(float, nodes[NODE_LONG])):
+                graph.add_vertex(elt, lat, long)
+        else:
+            for elt in map(int, nodes[NODE_ID]):
+                graph.add_vertex(elt)
+    added = skipped = oneway = 0
+    if edges:
+        references = graph._vertex_references
+        weights = edges[EDGE_TIME] if coords else edges[EDGE_LENGTH]
+        add_edge = graph.add_edge
+        directed = graph.is_directed()
+        flags = _flags(edges, directed)
+        oneway = sum(flags)
+        if directed:
+            for a, b, weight, flag in zip(map(int, edges[EDGE_FROM]), map(int, edges[EDGE_TO]),
+                                          map(float, weights), flags):
+                x, y = references.get(a), references.get(b)
+                if x is None or y is None:
+                    skipped += 1
+                    continue
+                add_edge(x, y, weight)
+                if not flag:
+                    add_edge(y, x, weight)
+        else:
+            for a, b, weight in zip(map(int, edges[EDGE_FROM]), map(int, edges[EDGE_TO]),
+                                    map(float, weights)):
+                x, y = references.get(a), references.get(b)
+                if x is None or y is None:
+                    skipped += 1
+                    continue
+                add_edge(x, y, weight)
+        added = len(edges[0]) - skipped
+    return added, skipped, oneway
+
+
+def _chunks(file, chunk_size):
+    #Yield pieces of the file that each end on a record boundary
+    rest = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            if rest:
+                yield rest
+            return
+        text = rest + chunk
+        #Cut just before the last record started, as it may be incomplete
+        cut = max(text.rfind('\nNode\n'), text.rfind('\nEdge\n'))
+        if cut <= 0:
+            rest = text
+            continue
+        rest = text[cut+1:]
+        yield text[:cut+1]
+
+
+def load(filename, graph, chunk_size=CHUNK_SIZE):
+    """Reads the route file filename into graph, a Graph or RouteMap, a
+    large chunk at a time. Vertices are looked up by label in a dict as
+    edges are added, and the cyclic garbage collector is paused while the
+    graph is built since nothing loaded can form garbage cycles. Returns
+    the graph and a LoadReport"""
+    report = LoadReport(filename)
+    coords = hasattr(graph, '_vertex_coords')
+    enabled = gc.isenabled()
+    gc.disable()
+    start = time.perf_counter()
+    try:
+        with open(filename, 'r') as file:
+            for text in _chunks(file, chunk_size):
+                mark = time.perf_counter()
+                nodes, edges = _parse(text)
+                report.parse_seconds += time.perf_counter() - mark
+                mark = time.perf_counter()
+                added, skipped, oneway = _build(graph, nodes, edges, coords)
+                report.build_seconds += time.perf_counter() - mark
+                report.edges += added
+                report.skipped += skipped
+                report.oneway += oneway
+                if nodes:
+                    report.vertices += len(nodes[0])
+    finally:
+        if enabled:
+            gc.enable()
+    report.bytes = os.path.getsize(filename)
+    report.seconds = time.perf_counter() - start
+    return graph, report
@@ -0,0 +1,91 @@
+#-----------------------------------------------------------------------------
+# Many-to-many distance matrices ---------------------------------------------
+#-----------------------------------------------------------------------------
+
+import math
+from array import array
+
+import compat
+from csr import INFINITY
+
+#Graph and target ids used by the search in each worker process
+_graph = None
+_targets = None
+
+
+class DistanceMatrix:
+
+    """Costs from each source to each target in one flat array of doubles
+
+       The cost from source i to target j is at [i, j], and is inf when the
+       target cannot be reached.
+    """
+
+    def __init__(self, rows, cols, data):
+        self._rows = rows
+        self._cols = cols
+        self._data = data
+
+    def shape(self):
+        return (self._rows, self._cols)
+
+    def __getitem__(self, index):
+        i, j = index
+        return self._data[i * self._cols + j]
+
+    def row(self, i):
+        #Return the costs from source i as an array
+        return self._data[i * self._cols:(i + 1) * self._cols]
+
+    def as_numpy(self):
+        #Return the matrix as a 2D NumPy array sharing the same memory
+        numpy = compat.numpy()
+        if numpy is None:
+            raise ImportError('as_numpy requires NumPy')
+        return numpy.frombuffer(self._data, dtype=numpy.float64).reshape(self._rows, self._cols)
+
+    def __str__(self):
+        return '\n'.join(' '.join('%8s' % c for c in self.row(i)) for i in range(self._rows))
+
+
+def _init(graph, targets):
+    #Worker initialiser. With the fork start method the graph's arrays are
+    #inherited rather than copied, so every worker reads the same pages
+    global _graph, _targets
+    _graph = graph
+    _targets = targets
+
+
+def _row(source):
+    #Return the costs from source to every target, searching only until all
+    #of the targets have been settled
+    dist, _ = _graph.dijkstra(source, targets=_targets)
+    row = array('d')
+    for t in _targets:
+        row.append(math.inf if dist[t] == INFINITY else dist[t])
+    return row
+
+
+def distance_matrix(graph, sources, targets, processes=None):
+    """Computes the cost of the shortest path from every source to every
+    target in the CSRGraph graph, with one search per source. sources and
+    targets are lists of vertex ids. The searches are shared out over a pool
+    of processes, all the cores by default, or run in this process if
+    processes is 1. Returns a DistanceMatrix"""
+    sources = list(sources)
+    targets = list(targets)
+    if processes is None:
+        processes = compat.cpu_count()
+    processes = max(1, min(processes, len(sources)))
+    data = array('d')
+    if processes == 1:
+        _init(graph, targets)
+        for s in sources:
+            data.extend(_row(s))
+    else:
+        context = compat.fork_context()
+        chunksize = max(1, len(sources) // (processes * 4))
+        with context.Pool(processes, _init, (graph, targets)) as pool:
+            for row in pool.imap(_row, sources, chunksize):
+                data.extend(row)
+    return DistanceMatrix(len(sources), len(targets), data)
@@ -0,0 +1,260 @@
+#-----------------------------------------------------------------------------
+# Alternative priority queues ------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#Every queue here has the same interface as apq.APQ: add returns an Element
+#whose _key and _value can be read, and remove_min, min, update_key, length
+#and is_empty behave the same. The dijkstra methods can therefore take any of
+#them in place of the APQ.
+
+from heapq import heappush, heappop
+
+from apq import APQ, Element
+
+
+class RadixHeap:
+
+    """Monotone priority queue for non-negative integer keys
+
+       Keys are placed in buckets by the highest bit in which they differ
+       from the last key removed, so each element moves down at most once
+       per bit of the key. Keys added or updated may never be smaller than
+       the last key removed, which always holds for Dijkstra's algorithm.
+    """
+
+    def __init__(self):
+        self._buckets = [[] for _ in range(65)]
+        self._last = 0
+        self._length = 0
+
+    def _place(self, element):
+        #Append element to the bucket its key belongs in
+        bucket = self._buckets[(element._key ^ self._last).bit_length()]
+        element._index = len(bucket)
+        bucket.append(element)
+
+    def _unplace(self, element):
+        #Take element out of its bucket
+        bucket = self._buckets[(element._key ^ self._last).bit_length()]
+        last = bucket.pop()
+        if last is not element:
+            bucket[element._index] = last
+            last._index = element._index
+
+    def add(self, key, item):
+        #Add a new item with priority key, and return its Element
+        if key < self._last:
+            raise ValueError('RadixHeap keys must not decrease below %s' % self._last)
+        element = Element(key, item, None)
+        self._place(element)
+        self._length += 1
+        return element
+
+    def min(self):
+        #Return the Element with the smallest key, filling bucket 0 first
+        #if it is empty
+        buckets = self._buckets
+        if not buckets[0]:
+            i = 1
+            while not buckets[i]:
+                i += 1
+            moving = buckets[i]
+            buckets[i] = []
+            self._last = min(e._key for e in moving)
+            for element in moving:
+                self._place(element)
+        return buckets[0][-1]
+
+    def remove_min(self):
+        #Remove and return the Element with the smallest key
+        element = self.min()
+        self._buckets[0].pop()
+        self._length -= 1
+        element._index = None
+        return element
+
+    def update_key(self, element, newkey):
+        if newkey < self._last:
+            raise ValueError('RadixHeap keys must not decrease below %s' % self._last)
+        self._unplace(element)
+        element._key = newkey
+        self._place(element)
+
+    def remove(self, element):
+        self._unplace(element)
+        self._length -= 1
+        element._index = None
+        return element
+
+    def get_key(self, element):
+        return element._key
+
+    def is_empty(self):
+        return self._length == 0
+
+    def length(self):
+        return self._length
+
+
+class BucketQueue:
+
+    """Dial's bucket queue for integer keys
+
+       Holds max_weight + 1 buckets used as a ring, one per key value.
+       Every key in the queue must lie within max_weight of the last key
+       removed, which holds for Dijkstra's algorithm when no edge costs more
+       than max_weight. Best when edge costs are small integers.
+    """
+
+    def __init__(self, max_weight):
+        self._size = max_weight + 1
+        self._buckets = [[] for _ in range(self._size)]
+        self._current = 0
+        self._length = 0
+
+    def _place(self, element):
+        if not 0 <= element._key - self._current < self._size:
+            raise ValueError('BucketQueue key %s is outside [%s, %s]'
+                             % (element._key, self._current, self._current + self._size - 1))
+        bucket = self._buckets[element._key % self._size]
+        element._index = len(bucket)
+        bucket.append(element)
+
+    def _unplace(self, element):
+        bucket = self._buckets[element._key % self._size]
+        last = bucket.pop()
+        if last is not element:
+            bucket[element._index] = last
+            last._index = element._index
+
+    def add(self, key, item):
+        #Add a new item with priority key, and return its Element
+        element = Element(key, item, None)
+        self._place(element)
+        self._length += 1
+        return element
+
+    def min(self):
+        #Return the Element with the smallest key, moving round the ring to
+        #the first non-empty bucket
+        buckets = self._buckets
+        i = self._current % self._size
+        while not buckets[i]:
+            i += 1
+            self._current += 1
+            if i == self._size:
+                i = 0
+        return buckets[i][-1]
+
+    def remove_min(self):
+        #Remove and return the Element with the smallest key
+        element = self.min()
+        self._buckets[self._current % self._size].pop()
+        self._length -= 1
+        element._index = None
+        return element
+
+    def update_key(self, element, newkey):
+        self._unplace(element)
+        element._key = newkey
+        self._place(element)
+
+    def remove(self, element):
+        self._unplace(element)
+        self._length -= 1
+        element._index = None
+        return element
+
+    def get_key(self, element):
+        return element._key
+
+    def is_empty(self):
+        return self._length == 0
+
+    def length(self):
+        return self._length
+
+
+class LazyHeap:
+
+    """Binary heap from heapq without a decrease-key operation
+
+       update_key pushes a fresh entry for the element and leaves the old
+       one in the heap. An entry is skipped when it is popped if it no
+       longer matches its element, so the heap may hold more entries than
+       the queue holds elements.
+    """
+
+    def __init__(self):
+        self._heap = []
+        #Tie-breaker so entries never compare Elements, and a way to tell
+        #the current entry of an element from its stale ones
+        self._count = 0
+        self._length = 0
+
+    def _push(self, element):
+        self._count += 1
+        element._index = self._count
+        heappush(self._heap, (element._key, self._count, element))
+
+    def _clean(self):
+        #Drop stale entries from the top of the heap
+        heap = self._heap
+        while heap[0][1] != heap[0][2]._index:
+            heappop(heap)
+
+    def add(self, key, item):
+        #Add a new item with priority key, and return its Element
+        element = Element(key, item, None)
+        self._push(element)
+        self._length += 1
+        return element
+
+    def min(self):
+        self._clean()
+        return self._heap[0][2]
+
+    def remove_min(self):
+        #Remove and return the Element with the smallest key
+        self._clean()
+        element = heappop(self._heap)[2]
+        self._length -= 1
+        element._index = None
+        return element
+
+    def update_key(self, element, newkey):
+        element._key = newkey
+        self._push(element)
+
+    def remove(self, element):
+        #The element's entries become stale and are dropped when popped
+        self._length -= 1
+        element._index = None
+        return element
+
+    def get_key(self, element):
+        return element._key
+
+    def is_empty(self):
+        return self._length == 0
+
+    def length(self):
+        return self._length
+
+
+#Queues that can be chosen by name in the dijkstra and sp methods
+QUEUES = {'apq': APQ, 'radix': RadixHeap, 'bucket': BucketQueue, 'lazy': LazyHeap}
+
+
+def queue_factory(queue, max_weight):
+    #Return a zero-argument callable making the queue named by queue, which
+    #may also be a queue class or factory already. max_weight is called to
+    #find the largest edge cost if a bucket queue is wanted
+    if callable(queue):
+        return queue
+    if queue not in QUEUES:
+        raise ValueError('Unknown priority queue: %s' % queue)
+    if queue == 'bucket':
+        size = max_weight()
+        return lambda: BucketQueue(size)
+    return QUEUES[queue]
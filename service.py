@@ -0,0 +1,458 @@
+#-----------------------------------------------------------------------------
+# Routing service ------------------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#A small HTTP/JSON server on asyncio. The map is loaded once in this process
+#and a pool of worker processes is forked from it, so every worker shares
+#the map's pages and no search ever runs on the event loop. Endpoints:
+#
+#  GET /route?from=A&to=B[&algorithm=dijkstra]  route between two vertices
+#  GET /matrix?sources=A,B,...&targets=C,D,...  cost matrix, also as a POST
+#      with a JSON body {"sources": ["A", ...], "targets": ["C", ...]}
+#  GET /stats[?format=prometheus]               service and search counters
+#
+#Vertices are named by their labels. Identical requests arriving while one
+#is still being worked on share its result. At most max_pending searches
+#may be waiting for a worker; beyond that requests are turned away at once
+#with 503 and a Retry-After header rather than queued without bound. Request
+#bodies over max_body bytes are refused with 413 without being read.
+#
+#  python service.py serve --grid 200 --port 8080 --workers 4
+#  python service.py load --grid 200 --port 8080 --requests 5000 --concurrency 64
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import random
+import signal
+import sys
+import time
+from urllib.parse import urlsplit, parse_qs
+
+import compat
+from instrument import SearchStats, Collector
+
+#Reason phrases for the statuses the service sends
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+#Route map used by each worker process
+_routemap = None
+
+
+def _init(routemap):
+    #Worker initialiser. With the fork start method the map is inherited
+    #rather than copied
+    global _routemap
+    _routemap = routemap
+
+
+def _ready():
+    #Worker: do nothing, so that awaiting it shows the workers are running
+    return None
+
+
+def _route(source, target, algorithm):
+    #Worker: return ([[label, leg cost], ...] or None, SearchStats)
+    vertex = _routemap.get_vertex_by_label
+    stats = SearchStats()
+    route = _routemap.sp(vertex(source), vertex(target), algorithm, stats=stats)
+    if route is not None:
+        route = [[v.element(), cost] for v, cost in route]
+    return route, stats
+
+
+def _matrix(sources, targets):
+    #Worker: return the rows of the cost matrix, with None for no route
+    vertex = _routemap.get_vertex_by_label
+    matrix = _routemap.distance_matrix([vertex(s) for s in sources],
+                                       [vertex(t) for t in targets], processes=1)
+    return [[None if c == float('inf') else int(c) for c in matrix.row(i)]
+            for i in range(len(sources))]
+
+
+class _Busy(Exception):
+    pass
+
+
+class _HTTPError(Exception):
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class RouteService:
+
+    """HTTP/JSON routing service over one RouteMap
+
+       Attributes:
+       self._pool : ProcessPoolExecutor running the searches
+       self._inflight : dict from request key to the future of the search
+       answering it, shared by identical concurrent requests
+       self._pending : number of searches submitted and not yet finished
+       self._searches : Collector of the SearchStats returned by workers
+
+       Methods:
+       start : begin listening, forking the workers
+       close : stop listening and shut the workers down
+       address : (host, port) being listened on
+    """
+
+    def __init__(self, routemap, workers=None, max_pending=64, max_cells=10000,
+                 max_body=1 << 20, host='127.0.0.1', port=8080):
+        self._routemap = routemap
+        self._workers = workers or compat.cpu_count()
+        self._max_pending = max_pending
+        self._max_cells = max_cells
+        self._max_body = max_body
+        self._host = host
+        self._port = port
+        self._pool = None
+        self._server = None
+        self._connections = set()
+        self._inflight = dict()
+        self._pending = 0
+        self._searches = Collector('routemap')
+        self._counts = collections.Counter()
+        self._latencies = collections.deque(maxlen=10000)
+        self._started = time.time()
+
+    async def start(self):
+        #Build everything the workers need before forking them, so that it
+        #is shared rather than rebuilt in each
+        self._routemap.csr()
+        self._routemap.num_components()
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self._workers, mp_context=compat.fork_context(), initializer=_init,
+            initargs=(self._routemap,))
+        #The pool forks its workers on first use. Do that now, before any
+        #socket is open, or a worker would hold a copy of the connection
+        #being served and the client would never see it close
+        await asyncio.get_running_loop().run_in_executor(self._pool, _ready)
+        self._server = await asyncio.start_server(self._connection, self._host, self._port)
+        return self
+
+    def address(self):
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        #Stop listening, end the connections still open and shut the
+        #workers down
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    #HTTP --------------------------------------------------
+
+    async def _connection(self, reader, writer):
+        #Serve requests on one connection until the client closes it
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await self._send(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+                headers = dict()
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = b''
+                if 'content-length' in headers:
+                    #The body is refused unread, so the connection cannot
+                    #be used again after an error here
+                    text = headers['content-length']
+                    if not text.isdigit():
+                        self._counts['status_400'] += 1
+                        await self._send(writer, 400, {'error': 'bad Content-Length'}, False)
+                        break
+                    if int(text) > self._max_body:
+                        self._counts['status_413'] += 1
+                        await self._send(writer, 413, {'error': 'at most %i bytes of body'
+                                                                % self._max_body}, False)
+                        break
+                    body = await reader.readexactly(int(text))
+                keep = (headers.get('connection', '').lower() != 'close'
+                        and version.upper() == 'HTTP/1.1')
+                start = time.perf_counter()
+                status, payload = await self._dispatch(method.upper(), target, body)
+                self._latencies.append(time.perf_counter() - start)
+                self._counts['status_%i' % status] += 1
+                await self._send(writer, status, payload, keep)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            #The service is closing
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _send(self, writer, status, payload, keep):
+        if isinstance(payload, str):
+            body = payload.encode()
+            kind = 'text/plain; version=0.0.4'
+        else:
+            body = json.dumps(payload).encode()
+            kind = 'application/json'
+        head = ['HTTP/1.1 %i %s' % (status, REASONS[status]),
+                'Content-Type: %s' % kind,
+                'Content-Length: %i' % len(body),
+                'Connection: %s' % ('keep-alive' if keep else 'close')]
+        if status == 503:
+            head.append('Retry-After: 1')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, body):
+        #Return (status, payload) for one request
+        url = urlsplit(target)
+        query = dict((k, v[-1]) for k, v in parse_qs(url.query).items())
+        self._counts['requests'] += 1
+        try:
+            if url.path == '/route':
+                return 200, await self._route(method, query)
+            elif url.path == '/matrix':
+                return 200, await self._matrix(method, query, body)
+            elif url.path == '/stats':
+                if query.get('format') == 'prometheus':
+                    return 200, self._prometheus()
+                return 200, self.stats()
+            raise _HTTPError(404, 'no such endpoint: %s' % url.path)
+        except _HTTPError as e:
+            return e.status, {'error': str(e)}
+        except _Busy:
+            self._counts['rejected'] += 1
+            return 503, {'error': 'too many requests waiting, try again'}
+        except Exception as e:
+            return 500, {'error': '%s: %s' % (type(e).__name__, e)}
+
+    #Endpoints ---------------------------------------------
+
+    def _label(self, text):
+        #Return the vertex label written as text, checking it is on the map
+        try:
+            label = int(text)
+        except (TypeError, ValueError):
+            raise _HTTPError(400, 'bad vertex: %s' % text)
+        if self._routemap.get_vertex_by_label(label) is None:
+            raise _HTTPError(404, 'no such vertex: %s' % label)
+        return label
+
+    async def _route(self, method, query):
+        if method != 'GET':
+            raise _HTTPError(405, 'use GET for /route')
+        source = self._label(query.get('from'))
+        target = self._label(query.get('to'))
+        algorithm = query.get('algorithm', 'dijkstra')
+        if algorithm not in ('dijkstra', 'bidirectional', 'astar', 'ch', 'alt'):
+            raise _HTTPError(400, 'unknown algorithm: %s' % algorithm)
+        if algorithm == 'ch' and self._routemap._hierarchy is None:
+            raise _HTTPError(400, 'no contraction hierarchy on this map for algorithm ch')
+        if algorithm == 'alt' and self._routemap._landmarks is None:
+            raise _HTTPError(400, 'no landmarks on this map for algorithm alt')
+        route, stats = await self._submit(('route', source, target, algorithm),
+                                          _route, source, target, algorithm)
+        cost = None if route is None else sum(c for _, c in route)
+        return {'from': source, 'to': target, 'algorithm': algorithm, 'cost': cost,
+                'route': route, 'settled': stats.settled}
+
+    async def _matrix(self, method, query, body):
+        if method == 'POST':
+            try:
+                data = json.loads(body or b'{}')
+                sources, targets = data['sources'], data['targets']
+            except (ValueError, KeyError, TypeError):
+                raise _HTTPError(400, 'expected a JSON body with sources and targets')
+            for labels in (sources, targets):
+                if not isinstance(labels, list) or not all(isinstance(s, str) for s in labels):
+                    raise _HTTPError(400, 'sources and targets must be lists of strings')
+        elif method == 'GET':
+            sources = [s for s in query.get('sources', '').split(',') if s]
+            targets = [t for t in query.get('targets', '').split(',') if t]
+        else:
+            raise _HTTPError(405, 'use GET or POST for /matrix')
+        sources = [self._label(s) for s in sources]
+        targets = [self._label(t) for t in targets]
+        if not sources or not targets:
+            raise _HTTPError(400, 'sources and targets are both needed')
+        if len(sources) * len(targets) > self._max_cells:
+            raise _HTTPError(413, 'at most %i cells per matrix' % self._max_cells)
+        rows = await self._submit(('matrix', tuple(sources), tuple(targets)),
+                                  _matrix, sources, targets)
+        return {'sources': sources, 'targets': targets, 'costs': rows}
+
+    async def _submit(self, key, function, *args):
+        #Run function(*args) in the pool, or wait on the identical request
+        #already running. Raises _Busy if too many searches are waiting
+        future = self._inflight.get(key)
+        if future is not None:
+            self._counts['coalesced'] += 1
+            return await asyncio.shield(future)
+        if self._pending >= self._max_pending:
+            raise _Busy()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._pool, function, *args)
+        self._inflight[key] = future
+        self._pending += 1
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            self._pending -= 1
+            del self._inflight[key]
+        if key[0] == 'route':
+            self._searches(result[1])
+        self._counts['searches'] += 1
+        return result
+
+    def stats(self):
+        #Return the service counters and search totals as a dict
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {'uptime': time.time() - self._started,
+                'workers': self._workers,
+                'pending': self._pending,
+                'max_pending': self._max_pending,
+                'counts': dict(self._counts),
+                'latency': {'p50': percentile(0.5), 'p90': percentile(0.9),
+                            'p99': percentile(0.99), 'max': latencies[-1] if latencies else None},
+                'searches': self._searches.totals()}
+
+    def _prometheus(self):
+        lines = ['# TYPE routemap_service_pending gauge',
+                 'routemap_service_pending %i' % self._pending]
+        for name in sorted(self._counts):
+            lines.append('# TYPE routemap_service_%s_total counter' % name)
+            lines.append('routemap_service_%s_total %i' % (name, self._counts[name]))
+        return '\n'.join(lines) + '\n' + self._searches.to_prometheus()
+
+
+#Load generator --------------------------------------------------------------
+
+async def _client(host, port, paths, results):
+    #Send each path in turn over one keep-alive connection, recording
+    #(status, seconds) for each
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (path, host)).encode())
+            await writer.drain()
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b''):
+                    break
+                name, _, value = header.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            results.append((status, time.perf_counter() - start))
+    finally:
+        writer.close()
+
+
+async def load(host, port, labels, requests=1000, concurrency=32, repeat=0.0,
+               algorithm='dijkstra', seed=0):
+    """Sends requests /route requests between random pairs of labels from
+    concurrency connections at once, and returns a dict of throughput,
+    latency percentiles and counts of each status. A fraction repeat of the
+    requests reuse one popular pair, which exercises coalescing"""
+    rand = random.Random(seed)
+    hot = (rand.choice(labels), rand.choice(labels))
+    paths = []
+    for _ in range(requests):
+        a, b = hot if rand.random() < repeat else (rand.choice(labels), rand.choice(labels))
+        paths.append('/route?from=%s&to=%s&algorithm=%s' % (a, b, algorithm))
+    results = []
+    start = time.perf_counter()
+    await asyncio.gather(*[_client(host, port, paths[k::concurrency], results)
+                           for k in range(concurrency)])
+    seconds = time.perf_counter() - start
+    latencies = sorted(s for _, s in results)
+    statuses = collections.Counter(status for status, _ in results)
+    return {'requests': len(results),
+            'seconds': seconds,
+            'throughput': len(results) / seconds,
+            'statuses': dict(statuses),
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+            'max': latencies[-1]}
+
+
+def _map(args):
+    #Return the RouteMap named on the command line
+    if args.file:
+        from solution import graphreader2
+        return graphreader2(args.file)
+    from generators import grid_map
+    return grid_map(args.grid, args.grid)
+
+
+async def _serve(args):
+    service = await RouteService(_map(args), args.workers, args.max_pending,
+                                 host=args.host, port=args.port).start()
+    print('Serving on http://%s:%i' % service.address())
+    #Run until interrupted or terminated, then close down cleanly
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for name in ('SIGINT', 'SIGTERM'):
+        try:
+            loop.add_signal_handler(getattr(signal, name), stop.set)
+        except (AttributeError, NotImplementedError):
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Routing service and load generator')
+    parser.add_argument('command', choices=['serve', 'load'])
+    parser.add_argument('--file', help='route file to load')
+    parser.add_argument('--grid', type=int, default=100, help='side of a generated grid map')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, help='worker processes, one per core by default')
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--repeat', type=float, default=0.0, help='fraction of repeated requests')
+    args = parser.parse_args()
+    try:
+        if args.command == 'serve':
+            asyncio.run(_serve(args))
+        else:
+            labels = [v.element() for v in _map(args).vertices()]
+            report = asyncio.run(load(args.host, args.port, labels, args.requests,
+                                      args.concurrency, args.repeat))
+            print(json.dumps(report, indent=1))
+    except KeyboardInterrupt:
+        sys.exit(0)
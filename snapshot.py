@@ -0,0 +1,177 @@
+#-----------------------------------------------------------------------------
+# Binary graph snapshots -----------------------------------------------------
+#-----------------------------------------------------------------------------
+
+#A snapshot holds a CSRGraph in one file of flat little-endian arrays:
+#
+#  header   magic, version, vertex count n, edge entry count m
+#  labels   int64[n]    vertex elements, in id order
+#  order    int64[n]    ids sorted by label, for looking vertices up
+#  offsets  int64[n+1]  start of each vertex's edges in targets and weights
+#  targets  int64[m]
+#  weights  int64[m]
+#  lats     float64[n]
+#  longs    float64[n]
+#
+#load_snapshot maps the file into memory and reads the arrays in place, so
+#loading copies nothing and processes loading the same file share its pages.
+#
+#Indexes built over a map (contraction hierarchies, landmark tables and hub
+#labels) are saved with save_arrays in the same way: the header, with its
+#own magic and version, the number of arrays k and m unused, then
+#
+#  lengths  int64[k]    length of each array
+#  arrays   int64[...]  the arrays themselves, one after another
+#
+#Nothing in any of these files is executed when it is read.
+
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from csr import CSRGraph
+
+MAGIC = b'RMAPSNAP'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+
+
+class SortedIndex:
+
+    """Looks up a vertex id by label by binary search of a sorted order"""
+
+    def __init__(self, labels, order):
+        self._labels = labels
+        self._order = order
+
+    def __len__(self):
+        return len(self._order)
+
+    def __getitem__(self, k):
+        #The k-th smallest label, so that bisect can search the order
+        return self._labels[self._order[k]]
+
+    def get(self, label, default=None):
+        k = bisect_left(self, label)
+        if k < len(self._order) and self[k] == label:
+            return self._order[k]
+        return default
+
+
+def _little(a):
+    #Return a copy of array a in little-endian byte order
+    if sys.byteorder != 'little':
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a
+
+
+def _native(a):
+    #Return array a, read from little-endian bytes, in native byte order
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+
+def vertex_ids(routemap, labels=None):
+    """Returns (labels, ids) numbering the vertices of routemap for an
+    index over it: labels is the list of vertex elements by internal id and
+    ids the dict from Vertex to internal id. labels defaults to the
+    vertices in the map's own order. Given labels, as read back from a
+    file, raises ValueError if any of them is not in the map"""
+    if labels is None:
+        labels = [v.element() for v in routemap.vertices()]
+    ids = dict()
+    for i in range(len(labels)):
+        v = routemap.get_vertex_by_label(labels[i])
+        if v is None:
+            raise ValueError('Vertex %s is not in the route map' % labels[i])
+        ids[v] = i
+    return list(labels), ids
+
+
+def save_arrays(filename, magic, version, arrays):
+    #Write arrays, sequences of integers, to filename as int64 arrays after
+    #a header with the given 8-byte magic and version
+    arrays = [_little(array('q', a)) for a in arrays]
+    lengths = array('q', [len(a) for a in arrays])
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(magic, version, 0, len(arrays), 0))
+        file.write(_little(lengths).tobytes())
+        for a in arrays:
+            file.write(a.tobytes())
+
+
+def load_arrays(filename, magic, versions, what):
+    """Reads a file written by save_arrays and returns (version, arrays),
+    the arrays as int64 arrays. Raises ValueError, naming the file as a
+    what, if its magic is wrong, its version is not in versions or its
+    length does not match its header"""
+    with open(filename, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError('%s is not a %s' % (filename, what))
+    found, version, _, k, _ = HEADER.unpack_from(data, 0)
+    if found != magic:
+        raise ValueError('%s is not a %s' % (filename, what))
+    if version not in versions:
+        raise ValueError('Unsupported %s version: %s' % (what, version))
+    position = HEADER.size + 8 * k
+    if position > len(data):
+        raise ValueError('%s is truncated or corrupt' % filename)
+    lengths = _native(array('q', data[HEADER.size:position]))
+    if position + 8 * sum(lengths) != len(data):
+        raise ValueError('%s is truncated or corrupt' % filename)
+    arrays = []
+    for length in lengths:
+        arrays.append(_native(array('q', data[position:position + 8 * length])))
+        position += 8 * length
+    return version, arrays
+
+
+def save_snapshot(graph, filename):
+    #Write graph, a CSRGraph or a RouteMap, to filename
+    if not isinstance(graph, CSRGraph):
+        graph = graph.csr()
+    n = graph.num_vertices()
+    m = graph.num_edges()
+    labels = array('q', graph._labels)
+    order = array('q', sorted(range(n), key=labels.__getitem__))
+    sections = [labels, order,
+                array('q', graph._offsets), array('q', graph._targets),
+                array('q', graph._weights),
+                array('d', graph._lats), array('d', graph._longs)]
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, 0, n, m))
+        for section in sections:
+            file.write(_little(section).tobytes())
+
+
+def load_snapshot(filename):
+    """Maps the snapshot in filename into memory and returns a CSRGraph
+    whose arrays are views of the file. On big-endian machines the arrays
+    have to be copied and byte-swapped instead"""
+    with open(filename, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, _, n, m = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError('%s is not a route map snapshot' % filename)
+    if version != VERSION:
+        raise ValueError('Unsupported snapshot version: %s' % version)
+    sizes = [('q', n), ('q', n), ('q', n + 1), ('q', m), ('q', m), ('d', n), ('d', n)]
+    if HEADER.size + 8 * sum(size for _, size in sizes) != len(data):
+        raise ValueError('%s is truncated or corrupt' % filename)
+    view = memoryview(data)
+    sections = []
+    position = HEADER.size
+    for typecode, size in sizes:
+        section = view[position:position + 8 * size].cast(typecode)
+        if sys.byteorder != 'little':
+            section = array(typecode, section)
+            section.byteswap()
+        sections.append(section)
+        position += 8 * size
+    labels, order, offsets, targets, weights, lats, longs = sections
+    return CSRGraph(labels, offsets, targets, weights, lats, longs, SortedIndex(labels, order))
@@ -1,4 +1,22 @@
-from apq import APQ
+import copy
+import threading
+from collections import deque
+from types import MappingProxyType
+
+from geo import great_circle, GridIndex, convex_hull, concave_hull
+from ch import ContractionHierarchy
+from alt import Landmarks
+from hublabel import HubLabels
+from queues import queue_factory
+from csr import CSRGraph
+from matrix import distance_matrix
+from deltastep import delta_stepping
+from cache import TreeCache
+from components import Components
+import dynamic
+import instrument
+from loader import load
+from snapshot import save_snapshot
 
 class Vertex:
     """Class to implement Vertex ADT
@@ -72,11 +90,77 @@ class Edge:
         return output
 
 
+def _unlink(out, into, x):
+    #Remove vertex x and its edges from the out and in adjacency maps of a
+    #graph, which are the same dict if it is undirected. Returns the number
+    #of edges removed
+    for opp in out[x]:
+        if opp is not x:
+            del into[opp][x]
+    removed = len(out[x])
+    if into is not out:
+        for opp in into[x]:
+            if opp is not x:
+                del out[opp][x]
+        removed += len(into[x]) - (1 if x in out[x] else 0)
+        del into[x]
+    del out[x]
+    return removed
+
+
+def _reversed(graph):
+    #Return a shallow copy of a directed graph with its out and in maps
+    #swapped, so that get_edges gives the edges into a vertex. It shares the
+    #vertices and edges of graph, so it must not be changed, and a new one
+    #should be taken after graph changes. Edges keep their own ends, so
+    #follow them with opposite(). An undirected graph is its own reverse
+    if not graph._directed:
+        return graph
+    reverse = copy.copy(graph)
+    reverse._vertices, reverse._in_vertices = graph._in_vertices, graph._vertices
+    return reverse
+
+
+def _ends(graph, x, into):
+    #Return a list of the edges into x if into is True, or out of x if not,
+    #for a Graph or RouteMap. In an undirected graph, edges count as running
+    #from their first element to their second
+    if graph._directed:
+        edges = graph._in_vertices if into else graph._vertices
+        return list(edges[x].values()) if x in edges else []
+    output = []
+    if x in graph._vertices:
+        for e in graph._vertices[x].values():
+            if (e.getSecondElement() if into else e.getFirstElement()) == x:
+                output.append(e)
+    return output
+
+
+def _end_count(graph, x, into):
+    #Return the number of edges _ends would list, without listing them if
+    #the graph is directed
+    if graph._directed:
+        edges = graph._in_vertices if into else graph._vertices
+        return len(edges[x]) if x in edges else 0
+    return len(_ends(graph, x, into))
+
+
 class Graph:
-    """Class to represent undirected Graph ADT
+    """Class to represent Graph ADT, undirected unless directed is True
+
+       self._vertices maps each vertex to a dict of its out edges, keyed by
+       the vertex at the other end, and self._in_vertices does the same for
+       in edges. In an undirected graph both are the same dict
     """
-    def __init__(self):
+    def __init__(self, directed=False):
+        self._directed = directed
         self._vertices = dict()
+        self._in_vertices = dict() if directed else self._vertices
+        self._vertex_references = dict()
+        self._num_edges = 0
+        #Largest edge cost, used to size bucket queues. Worked out by
+        #max_weight when first wanted, since labels need not be numbers
+        self._max_weight = None
 
     #Query methods -----------------------------------------
 
@@ -102,74 +186,54 @@ class Graph:
 
     def num_edges(self):
         #Return the number of edges
-          return len(self.e1dges())
+          return self._num_edges
 
     def get_vertex_by_label(self, x):
         #Return the vertex with elt x
-        for v in self._vertices:
-            if v.element() == x:
-                return v
+        if x in self._vertex_references:
+            return self._vertex_references[x]
         return None
 
-    def get_edge(x, y):
+    def get_edge(self, x, y):
         #Return the edge from x to y
-        if y in self._vertices[x]:
+        if x in self._vertices and y in self._vertices[x]:
             return self._vertices[x][y]
         return None
 
+    def is_directed(self):
+        return self._directed
+
     def degree(self, x):
         #Return the degree of vertex x
         if x in self._vertices:
+            if self._directed:
+                return len(self._vertices[x]) + len(self._in_vertices[x])
             return len(self._vertices[x])
         return None
 
     def in_degree(self, x):
-        #Return the in-degree of vertex x
-        in_degree = 0
-        if x in self._vertices:
-            edges = self._vertices[x]
-            for e in edges:
-                if edges[e].getSecondElement() == x:
-                    in_degree += 1
-        return in_degree
+        #Return the in-degree of vertex x. In an undirected graph, edges
+        #count as running from their first element to their second
+        return _end_count(self, x, True)
 
     def out_degree(self, x):
-        #Return the out-degree of vertex x
-        out_degree = 0
-        if x in self._vertices:
-            edges = self._vertices[x]
-            for e in edges:
-                if edges[e].getFirstElement() == x:
-                    out_degree += 1
-        return out_degree
+        #Return the out-degree of vertex x, with edges taken as for in_degree
+        return _end_count(self, x, False)
 
     def get_edges(self, x):
-        #Return a list of all edges incident on x
-        output = []
+        #Return a list of all edges incident on x, or only the out edges of
+        #x if the graph is directed
         if x in self._vertices:
-            for opp in self._vertices[x]:
-                output += [self._vertices[x][opp]]
-        return output
+            return list(self._vertices[x].values())
+        return []
 
     def get_in_edges(self, x):
-        #Return a list of all in edges of x
-        output = []
-        if x in self._vertices:
-            edges = self._vertices[x]
-            for e in edges:
-                if edges[e].getSecondElement() == x:
-                    output += [edges[e]]
-        return output
+        #Return a list of all in edges of x, with edges taken as for in_degree
+        return _ends(self, x, True)
 
     def get_out_edges(self, x):
-        #Return a list of all out edges of x
-        output = []
-        if x in self._vertices:
-            edges = self._vertices[x]
-            for e in edges:
-                if edges[e].getFirstElement() == x:
-                    output += [edges[e]]
-        return output
+        #Return a list of all out edges of x, with edges taken as for in_degree
+        return _ends(self, x, False)
 
     def highest_degree(self):
         highest = (None, 0)
@@ -182,23 +246,30 @@ class Graph:
 
     def add_vertex(self, elt):
         #Add a new vertex with element elt
-        v = Vertex(elt)
-        if v not in self._vertices:
+        if elt not in self._vertex_references:
+            v = Vertex(elt)
             self._vertices[v] = dict()
+            if self._directed:
+                self._in_vertices[v] = dict()
+            self._vertex_references[elt] = v
 
     def add_edge(self, x, y, elt):
-        #Add a new edge between x and y, with element elt
+        #Add a new edge between x and y, with element elt. In a directed
+        #graph the edge runs from x to y only. An edge already between them
+        #is replaced
         e = Edge(x, y, elt)
         if x in self._vertices and y in self._vertices:
+            if y not in self._vertices[x]:
+                self._num_edges += 1
             self._vertices[x][y] = e
-            self._vertices[y][x] = e
+            self._in_vertices[y][x] = e
+            self._max_weight = None
 
     def remove_vertex(self, x):
         #Remove vertex and all incident edges
         if x in self._vertices:
-            for opp in self._vertices[x]:
-                del self._vertices[opp][x]
-            del x
+            self._num_edges -= _unlink(self._vertices, self._in_vertices, x)
+            del self._vertex_references[x.element()]
 
     def remove_edge(self, e):
         #Remove edge e
@@ -206,76 +277,130 @@ class Graph:
         b = e.getSecondElement()
         if a in self._vertices:
             del self._vertices[a][b]
-        if b in self._vertices:
-            del self._vertices[b][a]
+        if b in self._in_vertices:
+            del self._in_vertices[b][a]
+        self._num_edges -= 1
+
+    def reverse(self):
+        #Return the graph with every edge turned round, for searching
+        #backwards. See _reversed
+        return _reversed(self)
 
     #Search Methods ----------------------------------------
 
+    #The traversals keep their own stack or queue rather than recursing, so
+    #they work on graphs of any size, and walk the adjacency dicts in place.
+    #The graph must not be changed while one of the iter_ generators is
+    #still being consumed
+
     def depthfirstsearch(self, v):
         #Move through the graph starting from vertex v, moving to a new vertex each
         #time, until no new vertices can be reached. Then back-track and try a different
-        #route. Repeat until all vertices have been reached
-        marked = {v:None}
-        self._depthfirstsearch(v, marked)
+        #route. Repeat until all vertices have been reached. Returns a dict
+        #from each vertex reached to the edge it was discovered through
+        marked = dict()
+        for w, e in self.iter_depthfirstsearch(v):
+            marked[w] = e
         return marked
 
-    def _depthfirstsearch(self, v, marked):
-        #Helper method for depthfirstsearch
-        for e in self.get_edges(v):
-            w = e.opposite(v)
-            if w not in marked:
-                marked[w] = e
-                self._depthfirstsearch(w, marked)
+    def iter_depthfirstsearch(self, v):
+        #Generate (vertex, edge) for each vertex reached from v in depth
+        #first order, with the edge it was discovered through (None for v)
+        marked = {v}
+        yield v, None
+        stack = [iter(self._vertices[v].items())]
+        while stack:
+            for w, e in stack[-1]:
+                if w not in marked:
+                    marked.add(w)
+                    yield w, e
+                    stack.append(iter(self._vertices[w].items()))
+                    break
+            else:
+                stack.pop()
 
     def breadthfirstsearch(self, v):
-        marked = {v:None}
-        level = [v]
-        while len(level) > 0:
-            nextlevel = []
-            for w in level:
-                for e in self.get_edges(w):
-                    x = e.opposite(w)
-                    if x not in marked:
-                        marked[x] = e
-                        nextlevel.append(x)
-            level = nextlevel
+        #Returns a dict from each vertex reachable from v to the edge it was
+        #discovered through, visiting them in order of the number of edges
+        #from v
+        marked = dict()
+        for w, e in self.iter_breadthfirstsearch(v):
+            marked[w] = e
         return marked
 
+    def iter_breadthfirstsearch(self, v):
+        #Generate (vertex, edge) for each vertex reached from v in breadth
+        #first order, with the edge it was discovered through (None for v)
+        marked = {v}
+        yield v, None
+        queue = deque([v])
+        while queue:
+            w = queue.popleft()
+            for x, e in self._vertices[w].items():
+                if x not in marked:
+                    marked.add(x)
+                    yield x, e
+                    queue.append(x)
+
     #Directed graph methods --------------------------------
 
+    #In an undirected graph each edge is taken to run from its first
+    #element to its second
+
     def topological_sort(self):
-        inedgecount = {}
-        tsort = []
-        available = []
-        for v in self._vertices:
-            v_incount = self.in_degree(v)
-            inedgecount[v] = v_incount
-            if v_incount == 0:
-                available.append(v)
-        while len(available) > 0:
+        #Return the vertices in topological order. If the graph has a cycle,
+        #the vertices on or after it are left out
+        return list(self.iter_topological_sort())
+
+    def iter_topological_sort(self):
+        #Kahn's algorithm: generate the vertices with no remaining in edges,
+        #taking the out edges of each away as it is generated
+        directed = self._directed
+        inedgecount = dict.fromkeys(self._vertices, 0)
+        for v, edges in self._vertices.items():
+            for u, e in edges.items():
+                if directed or (e.getFirstElement() is v and e.getSecondElement() is u):
+                    inedgecount[u] += 1
+        available = [v for v, count in inedgecount.items() if count == 0]
+        while available:
             w = available.pop()
-            tsort.append(w)
-            for e in self.get_edges(w):
-                u = e.opposite(w)
-                inedgecount[u] -= 1
-                if inedgecount[u] == 0:
-                    available.append(u)
-        return tsort
+            yield w
+            for u, e in self._vertices[w].items():
+                if directed or (e.getFirstElement() is w and e.getSecondElement() is u):
+                    inedgecount[u] -= 1
+                    if inedgecount[u] == 0:
+                        available.append(u)
 
     def is_dag(self):
-        t = self.topological_sort()
-        if len(t) > 0:
-            return True
-        return False
+        #Return True if the edges, taken as directed, form no cycle
+        count = 0
+        for _ in self.iter_topological_sort():
+            count += 1
+        return count == len(self._vertices)
 
     #Dijkstra's Algorithm ----------------------------------
 
-    def dijkstra(self, vertex):
+    def max_weight(self):
+        #Return the largest edge cost as used by dijkstra, found from the
+        #edges the first time it is asked for after a change. Removing
+        #edges does not lower it, so it is an upper bound
+        if self._max_weight is None:
+            self._max_weight = 0
+            for out in self._vertices.values():
+                for e in out.values():
+                    self._max_weight = max(self._max_weight, int(e.element()))
+        return self._max_weight
+
+    def dijkstra(self, vertex, queue='apq', stats=None):
         """Computes the shortest paths from vertex to all other reachable
-        vertices in the graph"""
+        vertices in the graph. queue picks the priority queue, either one
+        of the names in queues.QUEUES or a zero-argument factory. stats may
+        be an instrument.SearchStats to record what the search did"""
 
         #Initialise our APQ and three dictionaries
-        opened = APQ()
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        opened = instrument.counting(queue_factory(queue, self.max_weight), stats)()
         locations = dict()
         closed = dict()
         preds = dict()
@@ -298,10 +423,41 @@ class Graph:
                     elif newcost < locations[w]._key:
                         preds[w] = v._value
                         opened.update_key(locations[w], newcost)
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            stats['settled'] = len(closed)
+            stats['scanned'] = instrument.scanned(self._vertices, closed)
+        instrument.end(stats, 'dijkstra')
         return closed
 
-            
-            
+
+    def iter_dijkstra(self, vertex, queue='apq'):
+        """Generator form of dijkstra, yielding (vertex, cost, predecessor)
+        for each vertex as it is settled, cheapest first. The search only
+        goes as far as the caller reads, and keeps its APQ between reads,
+        so it can be stopped early or paused and resumed"""
+        opened = queue_factory(queue, self.max_weight)()
+        locations = dict()
+        closed = set()
+        preds = dict()
+        preds[vertex] = None
+        locations[vertex] = opened.add(0, vertex)
+        while opened._length > 0:
+            v = opened.remove_min()
+            locations.pop(v._value)
+            predecessor = preds.pop(v._value)
+            closed.add(v._value)
+            yield (v._value, v._key, predecessor)
+            for edge in self.get_edges(v._value):
+                w = edge.opposite(v._value)
+                if w not in closed:
+                    newcost = v._key + int(edge.element())
+                    if w not in locations:
+                        preds[w] = v._value
+                        locations[w] = opened.add(newcost, w)
+                    elif newcost < locations[w]._key:
+                        preds[w] = v._value
+                        opened.update_key(locations[w], newcost)
 
     #String Method -----------------------------------------
 
@@ -320,61 +476,24 @@ class Graph:
 
 #Test Methods---------------------------------------------
 
-def graphreader(filename):
-    """ Read and return the route map in filename. """
-    graph = Graph()
-    file = open(filename, 'r')
-    entry = file.readline() #either 'Node' or 'Edge'
-    num = 0
-    while entry == 'Node\n':
-        num += 1
-        nodeid = int(file.readline().split()[1])
-        vertex = graph.add_vertex(nodeid)
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'vertices and added into the graph')
-    num = 0
-    while entry == 'Edge\n':
-        num += 1
-        source = int(file.readline().split()[1])
-        sv = graph.get_vertex_by_label(source)
-        target = int(file.readline().split()[1])
-        tv = graph.get_vertex_by_label(target)
-        length = float(file.readline().split()[1])
-        edge = graph.add_edge(sv, tv, length)
-        file.readline() #read the one-way data
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'edges and added into the graph')
-    print(graph)
+def graphreader(filename, directed=False):
+    """ Read and return the route map in filename. If directed is True,
+    one-way roads are only added in their own direction. """
+    graph, report = load(filename, Graph(directed))
+    print('Read', report.vertices, 'vertices and added into the graph')
+    print('Read', report.edges, 'edges and added into the graph')
+    if report.skipped:
+        print('Skipped', report.skipped, 'edges with a missing vertex')
     return graph
 
-def graphreader2(filename):
-    """ Read and return the route map in filename. """
-    graph = RouteMap()
-    file = open(filename, 'r')
-    entry = file.readline() #either 'Node' or 'Edge'
-    num = 0
-    while entry == 'Node\n':
-        num += 1
-        nodeid = int(file.readline().split()[1])
-        gps = file.readline().split()
-        gps_lat, gps_long = float(gps[1]), float(gps[2])
-        vertex = graph.add_vertex(nodeid, gps_lat, gps_long)
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'vertices and added into the graph')
-    num = 0
-    while entry == 'Edge\n':
-        num += 1
-        source = int(file.readline().split()[1])
-        sv = graph.get_vertex_by_label(source)
-        target = int(file.readline().split()[1])
-        tv = graph.get_vertex_by_label(target)
-        file.readline()
-        time = float(file.readline().split()[1])
-        edge = graph.add_edge(sv, tv, time)
-        file.readline() #read the one-way data
-        entry = file.readline() #either 'Node' or 'Edge'
-    print('Read', num, 'edges and added into the graph')
-    print(graph)
+def graphreader2(filename, directed=False):
+    """ Read and return the route map in filename. If directed is True,
+    one-way roads are only added in their own direction. """
+    graph, report = load(filename, RouteMap(directed))
+    print('Read', report.vertices, 'vertices and added into the graph')
+    print('Read', report.edges, 'edges and added into the graph')
+    if report.skipped:
+        print('Skipped', report.skipped, 'edges with a missing vertex')
     return graph
 
 def runDijkstras(filename, vertex):
@@ -396,11 +515,35 @@ def runDijkstras(filename, vertex):
 
 class RouteMap:
 
-    def __init__(self):
+    def __init__(self, directed=False):
+        #Out edges of each vertex, and in edges, which are the same dict
+        #unless the map is directed (see Graph)
+        self._directed = directed
         self._vertices = dict()
+        self._in_vertices = dict() if directed else self._vertices
         self._vertex_coords = dict()
         self._vertex_references = dict()
         self._num_edges = 0
+        #Fastest straight-line speed over any edge, used by the A* heuristic
+        self._max_speed = 0.0
+        #Largest edge cost, used to size bucket queues
+        self._max_weight = 0
+        #Contraction hierarchy used by sp(algorithm='ch'), if one is built
+        self._hierarchy = None
+        #Landmark tables used by sp(algorithm='alt'), if they are computed
+        self._landmarks = None
+        #Hub labels used by distance, if they are built
+        self._hub_labels = None
+        #Array-backed copy used by distance_matrix, built when first needed
+        self._csr = None
+        #Shortest path trees kept by source, once enable_tree_cache is called
+        self._tree_cache = None
+        #Spatial index of the vertices for finding them by co-ordinates
+        self._spatial = GridIndex()
+        #Connected components, kept up to date as edges are added. Removing
+        #an edge or vertex marks them stale until they are next needed
+        self._components = Components()
+        self._components_stale = False
 
     def __str__(self):
         output = """"""
@@ -449,32 +592,67 @@ class RouteMap:
             return self._vertex_references[x]
         return None
 
-    def get_edge(x, y):
+    def get_edge(self, x, y):
         #Return the edge from x to y
-        if y in self._vertices[x]:
+        if x in self._vertices and y in self._vertices[x]:
             return self._vertices[x][y]
         return None
 
+    def is_directed(self):
+        return self._directed
+
     def get_edges(self, x):
-        #Return a list of all edges incident on x
-        output = []
+        #Return a list of all edges incident on x, or only the out edges of
+        #x if the map is directed
         if x in self._vertices:
-            for opp in self._vertices[x]:
-                output += [self._vertices[x][opp]]
-        return output
+            return list(self._vertices[x].values())
+        return []
+
+    def get_in_edges(self, x):
+        #Return a list of the edges into x, as for Graph.get_in_edges
+        return _ends(self, x, True)
+
+    def get_out_edges(self, x):
+        #Return a list of the edges out of x, as for Graph.get_out_edges
+        return _ends(self, x, False)
 
     def degree(self, x):
         #Return the degree of vertex x
         if x in self._vertices:
+            if self._directed:
+                return len(self._vertices[x]) + len(self._in_vertices[x])
             return len(self._vertices[x])
         return None
 
+    def in_degree(self, x):
+        #Return the number of edges into x, as for Graph.in_degree
+        return _end_count(self, x, True)
+
+    def out_degree(self, x):
+        #Return the number of edges out of x, as for Graph.out_degree
+        return _end_count(self, x, False)
+
     def get_coords(self, v):
         #Return the co-ordinates of vertex v
         if v in self._vertex_coords:
             return self._vertex_coords[v]
         return None
 
+    def nearest_vertex(self, lat, long):
+        #Return the vertex closest to the co-ordinates, or None if the map is
+        #empty
+        return self._spatial.nearest(lat, long)
+
+    def nearest_vertices(self, lat, long, k):
+        #Return up to k (vertex, distance in metres) pairs closest to the
+        #co-ordinates, nearest first
+        return self._spatial.k_nearest(lat, long, k)
+
+    def vertices_within(self, lat, long, radius):
+        #Return (vertex, distance in metres) pairs for every vertex within
+        #radius metres of the co-ordinates, nearest first
+        return self._spatial.within(lat, long, radius)
+
     #Methods to add to graph -------------------------------
 
     def add_vertex(self, elt, lat, long):
@@ -482,23 +660,38 @@ class RouteMap:
         if elt not in self._vertex_references:
             v = Vertex(elt)
             self._vertices[v] = dict()
+            if self._directed:
+                self._in_vertices[v] = dict()
             self._vertex_references[elt] = v
             self._vertex_coords[v] = (lat, long)
+            self._spatial.add(v, lat, long)
+            self._components.add(v)
+            self._changed()
 
     def add_edge(self, x, y, elt):
-        #Add a new edge between x and y, with element elt
+        #Add a new edge between x and y, with element elt. In a directed
+        #map the edge runs from x to y only. An edge already between them
+        #is replaced
         e = Edge(x, y, elt)
         if x in self._vertices and y in self._vertices:
+            if y not in self._vertices[x]:
+                self._num_edges += 1
             self._vertices[x][y] = e
-            self._vertices[y][x] = e
-            self._num_edges += 1
+            self._in_vertices[y][x] = e
+            self._update_max_speed(x, y, elt)
+            self._max_weight = max(self._max_weight, int(elt))
+            self._components.union(x, y)
+            self._changed()
 
     def remove_vertex(self, x):
         #Remove vertex and all incident edges
         if x in self._vertices:
-            for opp in self._vertices[x]:
-                del self._vertices[opp][x]
-            del x
+            self._num_edges -= _unlink(self._vertices, self._in_vertices, x)
+            del self._vertex_references[x.element()]
+            del self._vertex_coords[x]
+            self._spatial.remove(x)
+            self._components_stale = True
+            self._changed()
 
     def remove_edge(self, e):
         #Remove edge e
@@ -506,64 +699,749 @@ class RouteMap:
         b = e.getSecondElement()
         if a in self._vertices:
             del self._vertices[a][b]
-        if b in self._vertices:
-            del self._vertices[b][a]
+        if b in self._in_vertices:
+            del self._in_vertices[b][a]
         self._num_edges -= 1
+        self._components_stale = True
+        self._changed()
+
+    def update_edge_weight(self, e, elt):
+        #Change the element of edge e to elt. Cached shortest path trees are
+        #repaired in place rather than discarded, visiting only the vertices
+        #whose route changes
+        a = e.getFirstElement()
+        b = e.getSecondElement()
+        oldcost = int(e.element())
+        e._label = elt
+        self._update_max_speed(a, b, elt)
+        self._max_weight = max(self._max_weight, int(elt))
+        self._changed(trees=False)
+        newcost = int(elt)
+        if self._tree_cache is None or newcost == oldcost:
+            return
+        for source, tree in self._tree_cache.items():
+            before = len(tree)
+            children = self._tree_cache.children(source)
+            if newcost < oldcost:
+                dynamic.decrease(self, tree, children, a, b)
+            else:
+                dynamic.increase(self, tree, children, a, b)
+            self._tree_cache.resized(source, before)
+
+    def _changed(self, trees=True):
+        #Discard everything derived from the map once it has been changed.
+        #Cached trees are kept if trees is False, for callers that repair
+        #them themselves
+        self._hierarchy = None
+        self._landmarks = None
+        self._hub_labels = None
+        self._csr = None
+        if trees and self._tree_cache is not None:
+            self._tree_cache.clear()
+
+    #Derived structures ------------------------------------
+
+    def reverse(self):
+        #Return the map with every edge turned round, for searching
+        #backwards (see _reversed). It starts with no derived structures
+        reverse = _reversed(self)
+        if reverse is not self:
+            reverse._hierarchy = None
+            reverse._landmarks = None
+            reverse._hub_labels = None
+            reverse._csr = None
+            reverse._tree_cache = None
+        return reverse
+
+    def freeze(self):
+        #Return a FrozenRouteMap snapshot of the map, which later changes to
+        #this map do not affect
+        return FrozenRouteMap(self)
+
+    def _copy_from(self, routemap):
+        #Fill this empty map with the vertices of routemap and copies of its
+        #edges. Vertices are shared, since nothing changes them, but edges
+        #are copied because update_edge_weight changes them in place
+        directed = self._directed
+        for v in routemap._vertices:
+            self._vertices[v] = dict()
+            if directed:
+                self._in_vertices[v] = dict()
+            self._vertex_references[v.element()] = v
+            lat, long = self._vertex_coords[v] = routemap._vertex_coords[v]
+            self._spatial.add(v, lat, long)
+            self._components.add(v)
+        copies = dict()
+        for v, out in routemap._vertices.items():
+            for w, e in out.items():
+                f = copies.get(id(e))
+                if f is None:
+                    a, b = e.vertices()
+                    f = copies[id(e)] = Edge(a, b, e.element())
+                    self._components.union(a, b)
+                self._vertices[v][w] = f
+                if directed:
+                    self._in_vertices[w][v] = f
+        self._num_edges = routemap._num_edges
+        self._max_speed = routemap._max_speed
+        self._max_weight = routemap._max_weight
+
+    def connected(self, v, w):
+        #Return True if there is a route between v and w. The components
+        #are rebuilt first if an edge or vertex has been removed since.
+        #Components of a directed map ignore the direction of edges, so
+        #False means no route but True may still have none one way
+        if self._components_stale:
+            self._components.rebuild(self)
+            self._components_stale = False
+        return self._components.connected(v, w)
+
+    def num_components(self):
+        #Return the number of connected components of the map
+        if self._components_stale:
+            self._components.rebuild(self)
+            self._components_stale = False
+        return self._components.num_components()
+
+    def csr(self):
+        #Return a CSRGraph copy of the map, kept until the map changes
+        if self._csr is None:
+            self._csr = CSRGraph.from_routemap(self)
+        return self._csr
+
+    def save_snapshot(self, filename):
+        #Write the map to a binary snapshot that snapshot.load_snapshot can
+        #map straight into memory
+        save_snapshot(self, filename)
+
+    def distance_matrix(self, sources, targets, processes=None):
+        #Return a DistanceMatrix of shortest path costs from each vertex in
+        #sources to each vertex in targets (see matrix.distance_matrix)
+        graph = self.csr()
+        return distance_matrix(graph, [graph.index(v.element()) for v in sources],
+                               [graph.index(v.element()) for v in targets], processes)
+
+    def delta_stepping(self, vertex, delta=None, processes=1):
+        #Return the {vertex: (cost, predecessor)} dict dijkstra would, found
+        #by delta-stepping over the CSR copy (see deltastep.delta_stepping)
+        graph = self.csr()
+        dist, pred = delta_stepping(graph, graph.index(vertex.element()), delta, processes)
+        return graph.to_closed(self, dist, pred)
+
+    def enable_tree_cache(self, max_trees=16, max_entries=None):
+        #Keep the shortest path trees computed by sp in a TreeCache, so that
+        #later routes from the same source need no search
+        self._tree_cache = TreeCache(max_trees, max_entries)
+        return self._tree_cache
+
+    def tree_cache(self):
+        #Return the TreeCache, or None if caching is not enabled
+        return self._tree_cache
+
+    def shortest_path_tree(self, vertex, stats=None, queue='apq'):
+        #Return dijkstra(vertex), reusing the cached tree if there is one.
+        #A tree that is cached is returned as a read-only view of it
+        if self._tree_cache is None:
+            return self.dijkstra(vertex, None, stats, queue)
+        tree = self._tree_cache.get(vertex)
+        if tree is None:
+            tree = self.dijkstra(vertex, None, stats, queue)
+            self._tree_cache.put(vertex, tree)
+            tree = MappingProxyType(tree)
+        elif stats is not None:
+            stats['settled'] = 0
+            stats['scanned'] = 0
+        return tree
+
+    def contract(self, filename=None):
+        #Build the contraction hierarchy used by sp(algorithm='ch'), saving
+        #it to filename if one is given. Any change to the map discards it
+        self._hierarchy = ContractionHierarchy(self)
+        self._hierarchy.preprocess()
+        if filename is not None:
+            self._hierarchy.save(filename)
+        return self._hierarchy
+
+    def load_hierarchy(self, filename):
+        #Load a contraction hierarchy saved by contract for this map
+        self._hierarchy = ContractionHierarchy.load(filename, self)
+        return self._hierarchy
+
+    def select_landmarks(self, count=16, strategy='farthest', seed=None, filename=None):
+        #Choose landmarks and compute the tables used by sp(algorithm='alt'),
+        #saving them to filename if one is given (see alt.Landmarks.select).
+        #Any change to the map discards them
+        self._landmarks = Landmarks(self)
+        self._landmarks.select(count, strategy, seed)
+        if filename is not None:
+            self._landmarks.save(filename)
+        return self._landmarks
+
+    def load_landmarks(self, filename):
+        #Load landmark tables saved by select_landmarks for this map
+        self._landmarks = Landmarks.load(filename, self)
+        return self._landmarks
+
+    def label_hubs(self, order=None, filename=None):
+        #Build the hub labels used by distance, saving them to filename if
+        #one is given (see hublabel.HubLabels.build for order). order
+        #defaults to 'ch', which gives far smaller labels, if contract has
+        #been called and to 'degree' if not. Any change to the map
+        #discards them
+        if order is None:
+            order = 'ch' if self._hierarchy is not None else 'degree'
+        self._hub_labels = HubLabels(self)
+        self._hub_labels.build(order)
+        if filename is not None:
+            self._hub_labels.save(filename)
+        return self._hub_labels
+
+    def load_hub_labels(self, filename):
+        #Load hub labels saved by label_hubs for this map
+        self._hub_labels = HubLabels.load(filename, self)
+        return self._hub_labels
+
+    def distance(self, v, w):
+        #Return the cost of the shortest path from v to w, or None if there
+        #is no route. It is looked up in the hub labels if label_hubs has
+        #been called, with no search, and otherwise found by sp
+        if self._hub_labels is not None:
+            return self._hub_labels.distance(v, w)
+        route = self.sp(v, w)
+        if route is None:
+            return None
+        return sum(cost for _, cost in route)
+
+    def _update_max_speed(self, x, y, elt):
+        #The straight-line distance between the ends of an edge is never more
+        #than the length of the road, so distance over cost gives an upper
+        #bound on the speed along that edge
+        a, b = self._vertex_coords[x], self._vertex_coords[y]
+        distance = great_circle(a[0], a[1], b[0], b[1])
+        cost = int(elt)
+        if cost > 0:
+            self._max_speed = max(self._max_speed, distance / cost)
+        elif distance > 0:
+            self._max_speed = float('inf')
+
+    def max_speed(self):
+        #Return the fastest straight-line speed over any edge
+        return self._max_speed
+
+    def max_weight(self):
+        #Return the largest edge cost as used by dijkstra. Removing edges
+        #does not lower it, so it is an upper bound
+        return self._max_weight
 
     #Dijkstra's Algorithm ----------------------------------
 
-    def dijkstra(self, vertex):
+    def dijkstra(self, vertex, target=None, stats=None, queue='apq', max_cost=None,
+                 targets=None):
         """Computes the shortest paths from vertex to all other reachable
-        vertices in the graph"""
+        vertices in the graph. If target is given the search stops as soon
+        as target has been settled, so only the vertices closer to vertex
+        than target appear in the result, and likewise if targets is a
+        collection of vertices once every one of them has been settled. If
+        max_cost is given, only the vertices that can be reached within
+        that cost are searched and returned. If stats is a dict, the
+        numbers of settled vertices and of edges looked at are stored in
+        stats['settled'] and stats['scanned']. An instrument.SearchStats
+        records more. queue picks the priority queue, either one of the
+        names in queues.QUEUES or a zero-argument factory"""
 
         #Initialise our APQ and three dictionaries
-        opened = APQ()
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        opened = instrument.counting(queue_factory(queue, self.max_weight), stats)()
         locations = dict()
         closed = dict()
         preds = dict()
         #There is no predecessor to the first vertex
         preds[vertex] = None
         locations[vertex] = opened.add(0, vertex)
+        #Vertices costing more than limit are never added to the APQ
+        limit = float('inf') if max_cost is None else max_cost
+        #Targets not yet settled, and the vertex the search stopped at
+        remaining = None if targets is None else set(targets)
+        last = target
         
         while opened._length > 0:
             v = opened.remove_min()
             locations.pop(v._value)
             predecessor = preds.pop(v._value)
             closed[v._value] = (v._key, predecessor)
+            if v._value is target:
+                break
+            if remaining is not None and v._value in remaining:
+                remaining.discard(v._value)
+                if not remaining:
+                    last = v._value
+                    break
             for edge in self.get_edges(v._value):
                 w = edge.opposite(v._value)
                 if w not in closed:
                     newcost = v._key + int(edge.element())
+                    if newcost > limit:
+                        continue
                     if w not in locations:
                         preds[w] = v._value
                         locations[w] = opened.add(newcost, w)
                     elif newcost < locations[w]._key:
                         preds[w] = v._value
                         opened.update_key(locations[w], newcost)
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            stats['settled'] = len(closed)
+            stats['scanned'] = instrument.scanned(self._vertices, closed, last)
+        instrument.end(stats, 'dijkstra')
         return closed
 
-    def sp(self, v, w):
-        #Will calculate the shortest path from v to w by calling the Dijkstra
-        #method
-        shortest_paths = self.dijkstra(v)
-        route = []
-        prev_cost = shortest_paths[w][0]
+    def iter_dijkstra(self, vertex, queue='apq', max_cost=None):
+        """Generator form of dijkstra, yielding (vertex, cost, predecessor)
+        for each vertex as it is settled, cheapest first. The search only
+        goes as far as the caller reads, and keeps its APQ between reads,
+        so it can be stopped early, say once the 5 nearest depots have been
+        seen, or paused and resumed. max_cost bounds the search as in
+        dijkstra"""
+        opened = queue_factory(queue, self.max_weight)()
+        locations = dict()
+        closed = set()
+        preds = dict()
+        preds[vertex] = None
+        locations[vertex] = opened.add(0, vertex)
+        limit = float('inf') if max_cost is None else max_cost
+        while opened._length > 0:
+            v = opened.remove_min()
+            locations.pop(v._value)
+            predecessor = preds.pop(v._value)
+            closed.add(v._value)
+            yield (v._value, v._key, predecessor)
+            for edge in self.get_edges(v._value):
+                w = edge.opposite(v._value)
+                if w not in closed:
+                    newcost = v._key + int(edge.element())
+                    if newcost > limit:
+                        continue
+                    if w not in locations:
+                        preds[w] = v._value
+                        locations[w] = opened.add(newcost, w)
+                    elif newcost < locations[w]._key:
+                        preds[w] = v._value
+                        opened.update_key(locations[w], newcost)
+
+    def bidirectional_dijkstra(self, v, w, stats=None, queue='apq'):
+        """Searches forwards from v and backwards from w at the same time,
+        stopping once the two frontiers have met and no shorter path can
+        exist. Returns the path as a list of (vertex, cost) pairs, where cost
+        is the cost of reaching that vertex from v, or None if w cannot be
+        reached from v. stats is as for dijkstra. queue picks the priority
+        queue as in dijkstra"""
+
+        #One APQ, one set of labels and one closed set for each direction.
+        #Labels hold (cost, predecessor) for every vertex reached so far
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        make = instrument.counting(queue_factory(queue, self.max_weight), stats)
+        opened = (make(), make())
+        locations = (dict(), dict())
+        labels = ({v: (0, None)}, {w: (0, None)})
+        closed = (set(), set())
+        adjacency = (self._vertices, self._in_vertices)
+        if v is w:
+            if stats is not None:
+                stats['settled'] = 0
+                stats['scanned'] = 0
+            instrument.end(stats, 'bidirectional')
+            return [(v, 0)]
+        locations[0][v] = opened[0].add(0, v)
+        locations[1][w] = opened[1].add(0, w)
+        best = None
+        meet = None
+
+        while opened[0]._length > 0 and opened[1]._length > 0:
+            top = opened[0].min()._key + opened[1].min()._key
+            if best is not None and top >= best:
+                break
+            #Expand whichever frontier has fewer open vertices
+            side = 0 if opened[0].length() <= opened[1].length() else 1
+            other = 1 - side
+            x = opened[side].remove_min()
+            locations[side].pop(x._value)
+            closed[side].add(x._value)
+            #The backward search follows edges into x
+            for y, edge in adjacency[side][x._value].items():
+                if y in closed[side]:
+                    continue
+                newcost = x._key + int(edge.element())
+                if y not in locations[side]:
+                    labels[side][y] = (newcost, x._value)
+                    locations[side][y] = opened[side].add(newcost, y)
+                elif newcost < locations[side][y]._key:
+                    labels[side][y] = (newcost, x._value)
+                    opened[side].update_key(locations[side][y], newcost)
+                #Check whether this edge joins the two searches up
+                if y in labels[other]:
+                    total = newcost + labels[other][y][0]
+                    if best is None or total < best:
+                        best = total
+                        meet = (x._value, y) if side == 0 else (y, x._value)
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            stats['settled'] = len(closed[0]) + len(closed[1])
+            stats['scanned'] = (instrument.scanned(adjacency[0], closed[0])
+                                + instrument.scanned(adjacency[1], closed[1]))
+        instrument.end(stats, 'bidirectional')
+        if best is None:
+            return None
+
+        #Walk back from the meeting edge to v, then forward along the
+        #backward search's predecessors to w
+        a, b = meet
+        path = []
+        vertex = a
+        while vertex is not None:
+            path.append((vertex, labels[0][vertex][0]))
+            vertex = labels[0][vertex][1]
+        path.reverse()
+        vertex = b
+        while vertex is not None:
+            path.append((vertex, best - labels[1][vertex][0]))
+            vertex = labels[1][vertex][1]
+        return path
+
+    def _heuristic(self, w, weight):
+        #Return a function giving a lower bound on the cost from a vertex to
+        #w: the straight-line distance covered at the fastest speed on the
+        #map. A weight above 1 makes the bound inadmissible, trading
+        #optimality of the route for a smaller search
+        if self._max_speed == 0 or self._max_speed == float('inf'):
+            return lambda x: 0
+        lat, long = self._vertex_coords[w]
+        scale = weight / self._max_speed
+        coords = self._vertex_coords
+        def h(x):
+            c = coords[x]
+            return great_circle(c[0], c[1], lat, long) * scale
+        return h
+
+    def astar(self, v, w, weight=1.0, stats=None, queue='apq'):
+        """Computes the shortest path from v to w with A* search, guided
+        towards w by the great-circle distance divided by the fastest speed
+        on the map. With weight above 1 the heuristic is inflated, so fewer
+        vertices are settled but the route found may cost up to weight times
+        the optimum. Returns the path as a list of (vertex, cost) pairs, or
+        None if w cannot be reached from v. stats is as for dijkstra. The
+        keys are not integers, so queue may only be 'apq', 'lazy' or a
+        factory for a queue that accepts any keys"""
+
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        h = self._heuristic(w, weight)
+        opened = instrument.counting(queue_factory(queue, self.max_weight), stats)()
+        locations = dict()
+        #Labels hold (cost from v, predecessor) for every vertex reached
+        labels = {v: (0, None)}
+        closed = set()
+        locations[v] = opened.add(h(v), v)
+        found = False
+
+        while opened._length > 0:
+            x = opened.remove_min()._value
+            locations.pop(x)
+            closed.add(x)
+            if x is w:
+                found = True
+                break
+            cost = labels[x][0]
+            for edge in self.get_edges(x):
+                y = edge.opposite(x)
+                if y in closed:
+                    continue
+                newcost = cost + int(edge.element())
+                if y not in locations:
+                    labels[y] = (newcost, x)
+                    locations[y] = opened.add(newcost + h(y), y)
+                elif newcost < labels[y][0]:
+                    labels[y] = (newcost, x)
+                    opened.update_key(locations[y], newcost + h(y))
+        instrument.phase(stats, 'search', start)
+        if stats is not None:
+            stats['settled'] = len(closed)
+            stats['scanned'] = instrument.scanned(self._vertices, closed, w)
+        instrument.end(stats, 'astar')
+        if not found:
+            return None
+        return self._walk(labels, v, w)
+
+    def _walk(self, closed, v, w):
+        #Follow the predecessors in closed back from w to v and return the
+        #path as a list of (vertex, cost) pairs
+        path = []
         vertex = w
-        while vertex != v:
-            data = shortest_paths[vertex]
-            cost = data[0]
-            route += [(vertex, (prev_cost-cost))]
-            prev_cost = cost
-            vertex = data[1]
-        return route[::-1]
+        while vertex is not None:
+            path.append((vertex, closed[vertex][0]))
+            if vertex is v:
+                break
+            vertex = closed[vertex][1]
+        return path[::-1]
+
+    def _legs(self, path):
+        #Turn a path of (vertex, cost) pairs into the route format used by
+        #printvlist, where each vertex after the first is paired with the
+        #cost of the leg leading to it
+        route = []
+        for i in range(1, len(path)):
+            route += [(path[i][0], path[i][1] - path[i-1][1])]
+        return route
+
+    def sp(self, v, w, algorithm='dijkstra', weight=1.0, stats=None, queue='apq'):
+        #Will calculate the shortest path from v to w. algorithm is one of
+        #'dijkstra', which stops searching once w is settled,
+        #'bidirectional', which searches from both ends at once, 'astar',
+        #which is guided towards w by the coordinates (see astar for weight),
+        #'ch', which queries the hierarchy built by contract, or 'alt', which
+        #uses the tables from select_landmarks. stats is as for dijkstra,
+        #and an instrument.SearchStats also times the component check and
+        #the building of the route as phases. queue picks the priority
+        #queue for the searches (see dijkstra).
+        #Once enable_tree_cache has been called, 'dijkstra' computes and
+        #caches the whole tree from v instead of stopping at w. Returns
+        #None if there is no route from v to w, which is known from the
+        #connected components before any search is started
+        if algorithm not in ('dijkstra', 'bidirectional', 'astar', 'ch', 'alt'):
+            raise ValueError('Unknown shortest path algorithm: %s' % algorithm)
+        if algorithm == 'ch' and self._hierarchy is None:
+            raise ValueError('No contraction hierarchy, call contract first')
+        if algorithm == 'alt' and self._landmarks is None:
+            raise ValueError('No landmarks, call select_landmarks first')
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        connected = self.connected(v, w)
+        instrument.phase(stats, 'components', start)
+        if not connected:
+            if stats is not None:
+                stats['settled'] = 0
+                stats['scanned'] = 0
+            instrument.end(stats, algorithm)
+            return None
+        if algorithm == 'dijkstra':
+            if self._tree_cache is not None:
+                shortest_paths = self.shortest_path_tree(v, stats, queue)
+            else:
+                shortest_paths = self.dijkstra(v, w, stats, queue)
+            start = instrument.clock(stats)
+            path = self._walk(shortest_paths, v, w) if w in shortest_paths else None
+        else:
+            if algorithm == 'bidirectional':
+                path = self.bidirectional_dijkstra(v, w, stats, queue)
+            elif algorithm == 'astar':
+                path = self.astar(v, w, weight, stats, queue)
+            elif algorithm == 'ch':
+                path = self._hierarchy.query(v, w, stats)
+            else:
+                path = self._landmarks.query(v, w, stats, queue)
+            start = instrument.clock(stats)
+        route = None if path is None else self._legs(path)
+        instrument.phase(stats, 'path', start)
+        instrument.end(stats, algorithm)
+        return route
+
+    def sp_many(self, v, targets, stats=None, queue='apq'):
+        #Calculate the shortest paths from v to every vertex in targets with
+        #one search, which stops once all the targets that can be reached
+        #are settled. Returns {target: route}, with each route in the form
+        #sp returns and None for targets with no route from v. stats and
+        #queue are as for sp, and the tree cache is used as there
+        instrument.begin(stats)
+        start = instrument.clock(stats)
+        wanted = set(w for w in targets if self.connected(v, w))
+        instrument.phase(stats, 'components', start)
+        if self._tree_cache is not None:
+            closed = self.shortest_path_tree(v, stats, queue)
+        elif wanted:
+            closed = self.dijkstra(v, None, stats, queue, targets=wanted)
+        else:
+            closed = dict()
+            if stats is not None:
+                stats['settled'] = 0
+                stats['scanned'] = 0
+        start = instrument.clock(stats)
+
+        #Join the paths to the targets into one tree, walking back from each
+        #target only until it meets a path already walked
+        children = dict()
+        walked = set()
+        for w in wanted:
+            while w is not v and w in closed and w not in walked:
+                walked.add(w)
+                children.setdefault(closed[w][1], []).append(w)
+                w = closed[w][1]
+        #Go down the tree depth first, keeping the route to the vertex on
+        #top of the stack, so each leg is worked out once however many
+        #routes share it
+        routes = dict((w, None) for w in targets)
+        route = []
+        stack = [(v, 0)] if v in closed else []
+        while stack:
+            x, depth = stack.pop()
+            del route[depth:]
+            if x is not v:
+                route.append((x, closed[x][0] - closed[closed[x][1]][0]))
+            if x in wanted:
+                routes[x] = list(route)
+            for child in children.get(x, ()):
+                stack.append((child, len(route)))
+        instrument.phase(stats, 'path', start)
+        instrument.end(stats, 'sp_many')
+        return routes
+
+    def isochrone(self, vertex, max_cost, queue='apq'):
+        #Return (vertex, cost, (lat, long)) for every vertex that can be
+        #reached from vertex within max_cost, cheapest first. Only that
+        #region of the map is searched
+        reached = self.dijkstra(vertex, None, None, queue, max_cost)
+        return [(v, reached[v][0], self._vertex_coords[v]) for v in reached]
+
+    def isochrone_polygon(self, vertex, max_cost, shape='convex', k=3, queue='apq'):
+        #Return the outline of the region reachable from vertex within
+        #max_cost as a list of (lat, long) points. shape is 'convex' for the
+        #convex hull, or 'concave' for a tighter k-nearest neighbours hull
+        #(see geo.concave_hull)
+        points = [coords for _, _, coords in self.isochrone(vertex, max_cost, queue)]
+        if shape == 'convex':
+            return convex_hull(points)
+        elif shape == 'concave':
+            return concave_hull(points, k)
+        raise ValueError('Unknown isochrone shape: %s' % shape)
+
+    def sp_from_coords(self, lat1, long1, lat2, long2, algorithm='dijkstra',
+                       weight=1.0, stats=None, queue='apq'):
+        #Calculate the shortest path between the vertices nearest to two
+        #pairs of co-ordinates. The other arguments are as for sp. Returns
+        #None, as for no route, if the map has no vertices to snap to
+        v = self.nearest_vertex(lat1, long1)
+        w = self.nearest_vertex(lat2, long2)
+        if v is None or w is None:
+            return None
+        return self.sp(v, w, algorithm, weight, stats, queue)
 
     def printvlist(self, lst):
+        #Print a route from sp, which is None when there is no route
+        if lst is None:
+            print("No route")
+            return
         print("type,latitude,longitude,element,cost")
         for pair in lst:
             gps = self.get_coords(pair[0])
             print("w,%.6f,%.6f,%10i,%3i" % (gps[0], gps[1], pair[0].element(), pair[1]))
             
 
+class FrozenRouteMap(RouteMap):
+
+    """A read-only snapshot of a RouteMap
+
+       Nothing in a frozen map changes once it is built, so any number of
+       threads can run sp, dijkstra and the other searches on it at once
+       without locking, and so can free-threaded builds of Python. Every
+       method that would change the map raises TypeError, and there is no
+       tree cache since looking a tree up changes the cache. A contraction
+       hierarchy, landmark tables or hub labels already built on the map
+       are carried over, but new ones cannot be built on a frozen map. The
+       CSR copy and the component of every vertex are worked out when the
+       map is frozen, since building them later would change it. thaw
+       returns a changeable copy to make the next version from.
+    """
+
+    def __init__(self, routemap, version=0):
+        RouteMap.__init__(self, routemap.is_directed())
+        self._copy_from(routemap)
+        self._version = version
+        #Root of every vertex's component, since find changes the
+        #union-find as it walks it
+        find = self._components.find
+        self._roots = dict((v, find(v)) for v in self._vertices)
+        #Derived structures refer to their map, so take copies pointing at
+        #this one. They share the vertices, which is what they index by
+        if routemap._hierarchy is not None:
+            self._hierarchy = copy.copy(routemap._hierarchy)
+            self._hierarchy._routemap = self
+        if routemap._landmarks is not None:
+            self._landmarks = copy.copy(routemap._landmarks)
+            self._landmarks._routemap = self
+        if routemap._hub_labels is not None:
+            self._hub_labels = copy.copy(routemap._hub_labels)
+            self._hub_labels._routemap = self
+        self._csr = routemap._csr if routemap._csr is not None else CSRGraph.from_routemap(self)
+
+    def version(self):
+        #Return the version number given by VersionedRouteMap, or 0
+        return self._version
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        #Return a RouteMap copy of this map that can be changed
+        routemap = RouteMap(self._directed)
+        routemap._copy_from(self)
+        return routemap
+
+    def connected(self, v, w):
+        return self._roots[v] is self._roots[w]
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError('FrozenRouteMap cannot be changed, change a copy from thaw')
+
+    add_vertex = _frozen
+    add_edge = _frozen
+    remove_vertex = _frozen
+    remove_edge = _frozen
+    update_edge_weight = _frozen
+    enable_tree_cache = _frozen
+    contract = _frozen
+    load_hierarchy = _frozen
+    select_landmarks = _frozen
+    load_landmarks = _frozen
+    label_hubs = _frozen
+    load_hub_labels = _frozen
+
+
+class VersionedRouteMap:
+
+    """A series of FrozenRouteMap versions of a map
+
+       Readers take the current version with current and search it for as
+       long as they like. Writers pass a function to update, which is
+       called with a changeable copy of the current version. The copy is
+       then frozen and swapped in as the next version with a single
+       assignment, so readers see either the old map or the new one and
+       never a map part way through a change. Updates are made one at a
+       time. Each one copies the whole map, so batch changes into one
+       update where possible. A hierarchy or landmarks wanted on the new
+       version should be built by the function after its changes.
+    """
+
+    def __init__(self, routemap):
+        self._lock = threading.Lock()
+        self._current = FrozenRouteMap(routemap)
+
+    def current(self):
+        #Return the current FrozenRouteMap
+        return self._current
+
+    def version(self):
+        return self._current.version()
+
+    def update(self, change):
+        #Call change with a RouteMap copy of the current version, then make
+        #the changed copy the new current version and return it
+        with self._lock:
+            routemap = self._current.thaw()
+            change(routemap)
+            self._current = FrozenRouteMap(routemap, self._current.version() + 1)
+            return self._current
+
+
 def routeTest():
     #Test routine for routemap class
     routemap = graphreader2('corkCityData.txt')
@@ -580,4 +1458,7 @@ def routeTest():
     source = routemap.get_vertex_by_label(ids[sourcestr])
     dest = routemap.get_vertex_by_label(ids[deststr])
     tree = routemap.sp(source, dest)
-    routemap.printvlist(tree)
+    if tree is None:
+        print('No route from', sourcestr, 'to', deststr)
+    else:
+        routemap.printvlist(tree)
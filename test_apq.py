@@ -0,0 +1,70 @@
+#-----------------------------------------------------------------------------
+# Tests for the adaptable priority queue -------------------------------------
+#-----------------------------------------------------------------------------
+
+import random
+import unittest
+
+from apq import APQ
+from csr import CSRGraph
+from generators import grid_map
+
+
+class HeapInvariantTest(unittest.TestCase):
+
+    def check(self, apq):
+        #Every element knows its own position, and no child has a smaller
+        #key than its parent
+        body = apq._body
+        self.assertEqual(len(body), apq.length())
+        for i in range(len(body)):
+            self.assertEqual(body[i]._index, i)
+            if i > 0:
+                self.assertFalse(body[i]._key < body[(i - 1) // apq._arity]._key)
+
+    def test_random_operations(self):
+        rand = random.Random(0)
+        for arity in (2, 3, 4, 8):
+            apq = APQ(arity)
+            live = []
+            for _ in range(2000):
+                op = rand.random()
+                if op < 0.4 or not live:
+                    live.append(apq.add(rand.randrange(1000), len(live)))
+                elif op < 0.6:
+                    element = rand.choice(live)
+                    apq.update_key(element, rand.randrange(1000))
+                elif op < 0.75:
+                    element = live.pop(rand.randrange(len(live)))
+                    apq.remove(element)
+                else:
+                    element = apq.remove_min()
+                    self.assertTrue(all(not e._key < element._key for e in live))
+                    live.remove(element)
+                self.check(apq)
+
+    def test_heapify(self):
+        rand = random.Random(1)
+        pairs = [(rand.randrange(100), i) for i in range(500)]
+        apq, elements = APQ.heapify(pairs, 3)
+        self.check(apq)
+        keys = [apq.remove_min()._key for _ in range(len(pairs))]
+        self.assertEqual(keys, sorted(k for k, _ in pairs))
+
+
+class DijkstraOrderTest(unittest.TestCase):
+
+    def test_costs_match_heapq_search(self):
+        #Before the d-ary rewrite remove_min left the moved element with a
+        #stale index and sifting down did not pick the smaller child, so
+        #searches on this grid settled vertices out of order
+        routemap = grid_map(12, 12)
+        graph = CSRGraph.from_routemap(routemap)
+        for v in routemap.vertices()[::7]:
+            dist, _ = graph.dijkstra(graph.index(v.element()))
+            for w, (cost, _) in routemap.dijkstra(v).items():
+                self.assertEqual(cost, dist[graph.index(w.element())])
+
+
+if __name__ == '__main__':
+    unittest.main()
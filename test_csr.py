@@ -0,0 +1,58 @@
+#-----------------------------------------------------------------------------
+# Tests for the CSR graph and its searches -----------------------------------
+#-----------------------------------------------------------------------------
+
+import unittest
+
+from csr import CSRGraph, INFINITY
+from generators import grid_map
+from solution import RouteMap
+
+
+def line_map(n):
+    #Return a RouteMap of n vertices in a line, each edge costing its
+    #index plus one
+    routemap = RouteMap()
+    for i in range(n):
+        routemap.add_vertex(i, 51.85, -8.55 + i * 0.001)
+    for i in range(n - 1):
+        routemap.add_edge(routemap.get_vertex_by_label(i), routemap.get_vertex_by_label(i + 1), i + 1)
+    return routemap
+
+
+class TargetedDijkstraTest(unittest.TestCase):
+
+    def test_stops_once_targets_settled(self):
+        graph = CSRGraph.from_routemap(line_map(100))
+        source = graph.index(0)
+        full, _ = graph.dijkstra(source)
+        dist, pred = graph.dijkstra(source, targets=[graph.index(3), graph.index(5)])
+        for label in (3, 5):
+            self.assertEqual(dist[graph.index(label)], full[graph.index(label)])
+        #Nothing past the far target was reached
+        self.assertEqual(dist[graph.index(7)], INFINITY)
+        self.assertEqual(pred[graph.index(99)], -1)
+
+    def test_costs_match_full_search(self):
+        graph = grid_map(15, 15, seed=1).csr()
+        targets = list(range(0, graph.num_vertices(), 17))
+        for source in (0, 112, 224):
+            full, _ = graph.dijkstra(source)
+            dist, _ = graph.dijkstra(source, targets=targets)
+            for t in targets:
+                self.assertEqual(dist[t], full[t])
+
+    def test_distance_matrix(self):
+        routemap = grid_map(10, 10, seed=2)
+        vertices = routemap.vertices()
+        sources, targets = vertices[:5], vertices[-5:]
+        matrix = routemap.distance_matrix(sources, targets, processes=1)
+        for i in range(len(sources)):
+            closed = routemap.dijkstra(sources[i])
+            for j in range(len(targets)):
+                expected = closed[targets[j]][0] if targets[j] in closed else float('inf')
+                self.assertEqual(matrix[i, j], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
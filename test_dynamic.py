@@ -0,0 +1,44 @@
+#-----------------------------------------------------------------------------
+# Tests for repairing cached shortest path trees -----------------------------
+#-----------------------------------------------------------------------------
+
+import random
+import unittest
+
+from generators import grid_map
+
+
+class TreeRepairTest(unittest.TestCase):
+
+    def check_repairs(self, routemap, changes=200, seed=0):
+        #Change random edge weights up and down and compare every cached
+        #tree with a fresh search after each change
+        rand = random.Random(seed)
+        cache = routemap.enable_tree_cache()
+        sources = routemap.vertices()[::13]
+        for v in sources:
+            routemap.shortest_path_tree(v)
+        edges = [e for v in routemap.vertices() for e in routemap.get_edges(v)]
+        for _ in range(changes):
+            e = rand.choice(edges)
+            weight = int(e.element())
+            routemap.update_edge_weight(e, max(1, weight + rand.randint(-weight // 2, weight)))
+            for v in sources:
+                tree = cache.get(v)
+                self.assertIsNotNone(tree)
+                full = routemap.dijkstra(v)
+                self.assertEqual(set(tree), set(full))
+                for x, (cost, pred) in tree.items():
+                    self.assertEqual(cost, full[x][0])
+                    if pred is not None:
+                        self.assertEqual(tree[pred][0] + int(routemap.get_edge(pred, x).element()), cost)
+
+    def test_undirected(self):
+        self.check_repairs(grid_map(10, 10, seed=1))
+
+    def test_directed(self):
+        self.check_repairs(grid_map(10, 10, seed=1, oneway=0.3))
+
+
+if __name__ == '__main__':
+    unittest.main()
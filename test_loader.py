@@ -0,0 +1,105 @@
+#-----------------------------------------------------------------------------
+# Tests for the route file loader --------------------------------------------
+#-----------------------------------------------------------------------------
+
+import os
+import tempfile
+import unittest
+
+from generators import grid_file
+from loader import load
+from solution import Graph, RouteMap
+
+
+def edge_set(graph):
+    #Return the set of (from, to, cost) of the edges of graph, by label
+    edges = set()
+    for v in graph.vertices():
+        for e in graph.get_edges(v):
+            edges.add((v.element(), e.opposite(v).element(), int(e.element())))
+    return edges
+
+
+class LoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, name, text):
+        filename = os.path.join(self.directory, name)
+        with open(filename, 'w') as file:
+            file.write(text)
+        return filename
+
+
+class ChunkedLoadTest(LoaderTest):
+
+    def test_chunk_sizes_agree(self):
+        filename = os.path.join(self.directory, 'grid.txt')
+        vertices, edges = grid_file(filename, 12, 12, seed=1)
+        routemap, report = load(filename, RouteMap())
+        self.assertEqual((report.vertices, report.edges, report.skipped), (vertices, edges, 0))
+        self.assertEqual(routemap.num_vertices(), vertices)
+        self.assertEqual(routemap.num_edges(), edges)
+        expected = edge_set(routemap)
+        for chunk_size in (7, 64, 1000):
+            routemap, report = load(filename, RouteMap(), chunk_size)
+            self.assertEqual((report.vertices, report.edges), (vertices, edges))
+            self.assertEqual(edge_set(routemap), expected)
+
+    def test_missing_vertices_are_skipped(self):
+        filename = self.write('missing.txt',
+                              'Node\nid: 1\ngps: 51.85 -8.55\n'
+                              'Node\nid: 2\ngps: 51.86 -8.55\n'
+                              'Edge\nfrom: 1\nto: 2\nlength: 10.0\ntime: 5.0\noneway: N\n'
+                              'Edge\nfrom: 1\nto: 3\nlength: 10.0\ntime: 5.0\noneway: N\n')
+        routemap, report = load(filename, RouteMap())
+        self.assertEqual((report.edges, report.skipped), (1, 1))
+        self.assertEqual(routemap.num_edges(), 1)
+
+
+class DirectedLoadTest(LoaderTest):
+
+    ROUTE_FILE = ('Node\nid: 1\ngps: 51.85 -8.55\n'
+                  'Node\nid: 2\ngps: 51.86 -8.55\n'
+                  'Node\nid: 3\ngps: 51.87 -8.55\n'
+                  'Edge\nfrom: 1\nto: 2\nlength: 10.0\ntime: 5.0\noneway: Y\n'
+                  'Edge\nfrom: 2\nto: 3\nlength: 20.0\ntime: 8.0\noneway: N\n')
+
+    GRAPH_FILE = ('Node\nid: 1\nNode\nid: 2\nNode\nid: 3\n'
+                  'Edge\nfrom: 1\nto: 2\nlength: 10.0\noneway: Y\n'
+                  'Edge\nfrom: 2\nto: 3\nlength: 20.0\noneway: N\n')
+
+    def test_route_file(self):
+        filename = self.write('route.txt', self.ROUTE_FILE)
+        routemap, report = load(filename, RouteMap(directed=True))
+        self.assertEqual(report.oneway, 1)
+        self.assertEqual(edge_set(routemap), {(1, 2, 5), (2, 3, 8), (3, 2, 8)})
+        routemap, _ = load(filename, RouteMap())
+        self.assertEqual(routemap.num_edges(), 2)
+
+    def test_graph_file(self):
+        #Graph files have no time field, so the flag is in another column
+        filename = self.write('graph.txt', self.GRAPH_FILE)
+        graph, report = load(filename, Graph(directed=True))
+        self.assertEqual(report.oneway, 1)
+        self.assertEqual(edge_set(graph), {(1, 2, 10), (2, 3, 20), (3, 2, 20)})
+        a, b = graph.get_vertex_by_label(1), graph.get_vertex_by_label(2)
+        self.assertEqual((graph.in_degree(a), graph.out_degree(a)), (0, 1))
+        self.assertEqual((graph.in_degree(b), graph.out_degree(b)), (2, 1))
+
+    def test_missing_or_unknown_flag(self):
+        filename = self.write('noflag.txt', 'Node\nid: 1\nNode\nid: 2\n'
+                                            'Edge\nfrom: 1\nto: 2\nlength: 10.0\n')
+        self.assertRaises(ValueError, load, filename, Graph(directed=True))
+        self.assertEqual(load(filename, Graph())[0].num_edges(), 1)
+        filename = self.write('badflag.txt', self.GRAPH_FILE.replace('oneway: Y', 'oneway: yes'))
+        self.assertRaises(ValueError, load, filename, Graph(directed=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
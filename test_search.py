@@ -0,0 +1,194 @@
+#-----------------------------------------------------------------------------
+# Tests that every search engine agrees with dijkstra ------------------------
+#-----------------------------------------------------------------------------
+
+import os
+import random
+import tempfile
+import unittest
+
+import compat
+import deltastep
+from generators import grid_map
+from instrument import SearchStats
+
+
+def maps():
+    #Yield small random maps, undirected and with one-way streets
+    for seed in range(3):
+        yield grid_map(8, 8, seed=seed, keep=0.8)
+        yield grid_map(8, 8, seed=seed, keep=0.8, oneway=0.3)
+
+
+def pairs(routemap, count=40, seed=0):
+    #Return count random (source, target) pairs of vertices of routemap
+    rand = random.Random(seed)
+    vertices = routemap.vertices()
+    return [(rand.choice(vertices), rand.choice(vertices)) for _ in range(count)]
+
+
+class EngineTest(unittest.TestCase):
+
+    def check_route(self, routemap, v, w, route):
+        #route must be None exactly when dijkstra cannot reach w, and
+        #otherwise follow real edges from v to w at the cost dijkstra finds
+        closed = routemap.dijkstra(v)
+        if w not in closed:
+            self.assertIsNone(route)
+            return
+        self.assertIsNotNone(route)
+        previous = v
+        for x, leg in route:
+            edge = routemap.get_edge(previous, x)
+            self.assertIsNotNone(edge)
+            self.assertEqual(leg, int(edge.element()))
+            previous = x
+        self.assertIs(previous, w)
+        self.assertEqual(sum(leg for _, leg in route), closed[w][0])
+
+
+class BidirectionalTest(EngineTest):
+
+    def test_early_exit(self):
+        for routemap in maps():
+            for v, w in pairs(routemap):
+                closed = routemap.dijkstra(v, w)
+                full = routemap.dijkstra(v)
+                if w in full:
+                    self.assertEqual(closed[w], full[w])
+
+    def test_routes(self):
+        for routemap in maps():
+            for v, w in pairs(routemap):
+                self.check_route(routemap, v, w, routemap.sp(v, w, 'bidirectional'))
+
+
+class AStarTest(EngineTest):
+
+    def test_routes(self):
+        for routemap in maps():
+            for v, w in pairs(routemap):
+                self.check_route(routemap, v, w, routemap.sp(v, w, 'astar'))
+
+
+class ContractionHierarchyTest(EngineTest):
+
+    def test_routes(self):
+        for routemap in maps():
+            if routemap.is_directed():
+                self.assertRaises(ValueError, routemap.contract)
+                continue
+            routemap.contract()
+            for v, w in pairs(routemap):
+                self.check_route(routemap, v, w, routemap.sp(v, w, 'ch'))
+
+    def test_save_and_load(self):
+        routemap = grid_map(8, 8, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'map.ch')
+            routemap.contract(filename)
+            copy = grid_map(8, 8, seed=1)
+            copy.load_hierarchy(filename)
+            self.assertRaises(ValueError, grid_map(7, 7).load_hierarchy, filename)
+        for v, w in pairs(copy):
+            self.check_route(copy, v, w, copy.sp(v, w, 'ch'))
+
+
+class LandmarkTest(EngineTest):
+
+    def test_routes(self):
+        for routemap in maps():
+            for strategy in ('farthest', 'avoid'):
+                routemap.select_landmarks(4, strategy, seed=0)
+                for v, w in pairs(routemap):
+                    self.check_route(routemap, v, w, routemap.sp(v, w, 'alt'))
+
+    def test_lower_bounds(self):
+        for routemap in maps():
+            landmarks = routemap.select_landmarks(4)
+            for v, w in pairs(routemap):
+                closed = routemap.dijkstra(v)
+                if w in closed:
+                    self.assertLessEqual(landmarks.lower_bound(v, w), closed[w][0])
+
+    def test_trivial_query_is_recorded(self):
+        routemap = grid_map(5, 5, seed=1)
+        landmarks = routemap.select_landmarks(2)
+        published = []
+        v = routemap.vertices()[0]
+        self.assertEqual(landmarks.query(v, v, SearchStats(published.append)), [(v, 0)])
+        self.assertEqual([(s.algorithm, s.settled) for s in published], [('alt', 0)])
+
+    def test_save_and_load(self):
+        for routemap in (grid_map(8, 8, seed=1), grid_map(8, 8, seed=1, oneway=0.3)):
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, 'map.alt')
+                routemap.select_landmarks(4, filename=filename)
+                copy = grid_map(8, 8, seed=1, oneway=0.3 if routemap.is_directed() else None)
+                copy.load_landmarks(filename)
+            for v, w in pairs(copy):
+                self.check_route(copy, v, w, copy.sp(v, w, 'alt'))
+
+
+class HubLabelTest(EngineTest):
+
+    def check_distances(self, routemap):
+        for v, w in pairs(routemap, 60):
+            closed = routemap.dijkstra(v)
+            self.assertEqual(routemap.distance(v, w), closed[w][0] if w in closed else None)
+            self.check_route(routemap, v, w, routemap._hub_labels.path(v, w))
+
+    def test_degree_order(self):
+        for routemap in maps():
+            routemap.label_hubs('degree')
+            self.check_distances(routemap)
+
+    def test_contraction_order(self):
+        for routemap in maps():
+            if not routemap.is_directed():
+                routemap.contract()
+                self.assertEqual(routemap.label_hubs()._order, 'ch')
+                self.check_distances(routemap)
+
+    def test_save_and_load(self):
+        for routemap in (grid_map(8, 8, seed=1), grid_map(8, 8, seed=1, oneway=0.3)):
+            with tempfile.TemporaryDirectory() as directory:
+                filename = os.path.join(directory, 'map.hub')
+                routemap.label_hubs(filename=filename)
+                copy = grid_map(8, 8, seed=1, oneway=0.3 if routemap.is_directed() else None)
+                copy.load_hub_labels(filename)
+            self.check_distances(copy)
+
+
+class DeltaSteppingTest(EngineTest):
+
+    def check_tree(self, routemap, v, closed):
+        #closed must hold the costs dijkstra finds, each reached over a
+        #real edge from its predecessor
+        full = routemap.dijkstra(v)
+        self.assertEqual(set(closed), set(full))
+        for x, (cost, pred) in closed.items():
+            self.assertEqual(cost, full[x][0])
+            if pred is not None:
+                self.assertEqual(closed[pred][0] + int(routemap.get_edge(pred, x).element()), cost)
+
+    def test_costs(self):
+        for routemap in maps():
+            for v in routemap.vertices()[::9]:
+                self.check_tree(routemap, v, routemap.delta_stepping(v))
+
+    def test_paths_and_deltas(self):
+        routemap = grid_map(8, 8, seed=2, oneway=0.3)
+        graph = routemap.csr()
+        options = [(1, 1, False), (10 ** 6, 1, False), (None, 2, False)]
+        if compat.numpy() is not None:
+            options.append((None, 1, True))
+        for delta, processes, vectorized in options:
+            for v in routemap.vertices()[::9]:
+                dist, pred = deltastep.delta_stepping(graph, graph.index(v.element()),
+                                                      delta, processes, vectorized)
+                self.check_tree(routemap, v, graph.to_closed(routemap, dist, pred))
+
+
+if __name__ == '__main__':
+    unittest.main()
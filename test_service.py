@@ -0,0 +1,81 @@
+#-----------------------------------------------------------------------------
+# Tests for the routing service ----------------------------------------------
+#-----------------------------------------------------------------------------
+
+import asyncio
+import json
+import unittest
+
+from generators import grid_map
+from service import RouteService
+
+
+async def request(service, method, path, body=None):
+    #Send one request to service and return (status, decoded JSON body)
+    host, port = service.address()
+    reader, writer = await asyncio.open_connection(host, port)
+    head = '%s %s HTTP/1.1\r\nHost: %s\r\nConnection: close\r\n' % (method, path, host)
+    if body is not None:
+        head += 'Content-Length: %i\r\n' % len(body)
+    writer.write(head.encode() + b'\r\n' + (body or b''))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    header, _, payload = response.partition(b'\r\n\r\n')
+    return int(header.split()[1]), json.loads(payload)
+
+
+class RouteServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.routemap = grid_map(5, 5, seed=1)
+        self.labels = [v.element() for v in self.routemap.vertices()]
+
+    def exchange(self, *requests):
+        #Start a service on the map, send each (method, path, body) in turn
+        #and return the list of (status, payload)
+        async def run():
+            service = await RouteService(self.routemap, workers=1, port=0).start()
+            try:
+                return [await request(service, *r) for r in requests]
+            finally:
+                await service.close()
+        return asyncio.run(run())
+
+    def test_route_matches_sp(self):
+        a, b = self.labels[0], self.labels[-1]
+        [(status, payload)] = self.exchange(('GET', '/route?from=%s&to=%s' % (a, b), None))
+        self.assertEqual(status, 200)
+        vertex = self.routemap.get_vertex_by_label
+        route = self.routemap.sp(vertex(a), vertex(b))
+        self.assertEqual(payload['cost'], sum(c for _, c in route))
+
+    def test_unknown_vertex(self):
+        [(status, _)] = self.exchange(('GET', '/route?from=%s&to=-1' % self.labels[0], None))
+        self.assertEqual(status, 404)
+
+    def test_ch_without_hierarchy(self):
+        a, b = self.labels[0], self.labels[1]
+        [(status, _)] = self.exchange(('GET', '/route?from=%s&to=%s&algorithm=ch' % (a, b), None))
+        self.assertEqual(status, 400)
+
+    def test_matrix_body_types(self):
+        good = json.dumps({'sources': [str(self.labels[0])], 'targets': [str(self.labels[1])]})
+        results = self.exchange(('POST', '/matrix', json.dumps({'sources': 5, 'targets': ['x']}).encode()),
+                                ('POST', '/matrix', json.dumps({'sources': [1], 'targets': ['2']}).encode()),
+                                ('POST', '/matrix', good.encode()))
+        self.assertEqual([status for status, _ in results], [400, 400, 200])
+
+    def test_body_too_large(self):
+        async def run():
+            service = await RouteService(self.routemap, workers=1, max_body=16, port=0).start()
+            try:
+                return await request(service, 'POST', '/matrix', b'x' * 17)
+            finally:
+                await service.close()
+        status, _ = asyncio.run(run())
+        self.assertEqual(status, 413)
+
+
+if __name__ == '__main__':
+    unittest.main()